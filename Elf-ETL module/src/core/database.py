@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
 try:
     from .models import Child, Letter
 except ImportError:
@@ -15,8 +16,37 @@ SANTA_DB_URL = os.getenv("SANTA_DB_URL")
 if SANTA_DB_URL and SANTA_DB_URL.startswith("postgres://"):
     SANTA_DB_URL = SANTA_DB_URL.replace("postgres://", "postgresql://", 1)
 
-# Create engine
-engine = create_engine(SANTA_DB_URL, echo=True)
+# SQL echo is for debugging only: it logs every statement with its parameters
+SANTA_DB_ECHO = os.getenv("SANTA_DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+IS_SQLITE = SANTA_DB_URL.startswith("sqlite")
+
+# Create engine (server DBs get a sized pool that survives idle disconnects)
+engine_kwargs = {"echo": SANTA_DB_ECHO, "pool_pre_ping": True}
+if not IS_SQLITE:
+    engine_kwargs.update(pool_size=20, max_overflow=10, pool_recycle=1800)
+
+engine = create_engine(SANTA_DB_URL, **engine_kwargs)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL + relaxed fsync: far fewer disk syncs per commit."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+    # pysqlite's legacy transaction handling would turn the first SAVEPOINT into
+    # the outer transaction (its RELEASE commits): disable it and emit BEGIN
+    # ourselves (see _sqlite_begin), so begin_nested() works as on PostgreSQL
+    dbapi_connection.isolation_level = None
+
+def _sqlite_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(engine, "begin", _sqlite_begin)
 
 def init_db():
     """Initializes the database by creating tables."""
@@ -0,0 +1,140 @@
+"""
+LLM Response Cache for Elf-ETL.
+Two on-disk tiers for LLM extractions:
+- LLMCache: exact match on the prompt hash.
+- EmbeddingCache: nearest neighbour on the letter embedding, for near-duplicates.
+"""
+import os
+import json
+import math
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+
+def _default_cache_path() -> str:
+    # Use path relative to this file's module root (Elf-ETL module)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(base_dir, "cache", "llm", "cache.sqlite")
+
+
+class LLMCache:
+    """
+    SQLite-backed key/value store for serialized LLM responses.
+    Keys are prompt hashes, values are JSON strings.
+    Hit/miss counters are exposed in `stats`.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or _default_cache_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for `key`, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return row[0]
+
+    def set(self, key: str, value: str):
+        """Store `value` under `key`, replacing any previous entry."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)", (key, value)
+            )
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Semantic cache tier: stores (embedding, value) rows in SQLite and keeps an
+    in-memory flat inner-product index of the normalized embeddings.
+    `lookup` returns the value of the most similar stored text if its cosine
+    similarity exceeds `threshold`.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], list[float]],
+        threshold: float = 0.92,
+        path: Optional[str] = None
+    ):
+        path = path or _default_cache_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, embedding TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0}
+
+        # In-memory index: normalized vectors + values, loaded once
+        self._vectors: list[list[float]] = []
+        self._values: list[str] = []
+        for embedding, value in self._conn.execute("SELECT embedding, value FROM embedding_cache"):
+            self._vectors.append(json.loads(embedding))
+            self._values.append(value)
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> list[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, text: str) -> list[float]:
+        """Embed and normalize `text` (so inner product == cosine similarity)."""
+        return self._normalize(self.embed_fn(text))
+
+    def search(self, vector: list[float]) -> tuple[float, Optional[str]]:
+        """Return (similarity, value) of the nearest stored vector."""
+        best_score, best_value = -1.0, None
+        with self._lock:
+            for stored, value in zip(self._vectors, self._values):
+                score = sum(a * b for a, b in zip(vector, stored))
+                if score > best_score:
+                    best_score, best_value = score, value
+        return best_score, best_value
+
+    def lookup(
+        self,
+        vector: list[float],
+        accept: Optional[Callable[[str], bool]] = None
+    ) -> Optional[str]:
+        """
+        Return the nearest value if it is above the similarity threshold
+        and passes the optional `accept` guard.
+        """
+        score, value = self.search(vector)
+        if value is not None and score > self.threshold and (accept is None or accept(value)):
+            self.stats["hits"] += 1
+            return value
+        self.stats["misses"] += 1
+        return None
+
+    def add(self, vector: list[float], value: str):
+        """Store a normalized embedding and its value."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO embedding_cache (embedding, value) VALUES (?, ?)",
+                (json.dumps(vector), value)
+            )
+            self._conn.commit()
+            self._vectors.append(vector)
+            self._values.append(value)
@@ -0,0 +1,46 @@
+"""
+Shared Gemini client for Elf-ETL.
+One GoogleClient per model for the whole process, so every extractor reuses the
+same underlying HTTP connection pool instead of opening its own.
+With ELF_LLM_WARMUP=1 the connection is opened (DNS + TLS) when the client is
+created, so the first real extraction pays only for inference.
+"""
+import os
+import threading
+import logging
+from typing import Dict
+
+from datapizza.clients.google import GoogleClient
+
+WARM_UP = os.getenv("ELF_LLM_WARMUP", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[str, GoogleClient] = {}
+_clients_lock = threading.Lock()
+
+
+def warm_up(client: GoogleClient):
+    """
+    Open the connection to the Gemini API with a model metadata lookup.
+    It doesn't generate tokens, so it doesn't consume the generation quota.
+    """
+    try:
+        client.client.models.get(model=client.model_name)
+    except Exception as e:
+        # Warm-up is best effort: the first real call will just pay the handshake
+        logger.warning(f"Gemini warm-up failed: {e}")
+
+
+def get_gemini_client(model_name: str) -> GoogleClient:
+    """Return the process-wide GoogleClient for `model_name`, creating it on first use."""
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            client = _clients[model_name] = GoogleClient(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                model=model_name
+            )
+            if WARM_UP:
+                warm_up(client)
+    return client
@@ -0,0 +1,48 @@
+"""
+Logging helpers for Elf-ETL.
+File loggers hand records to a QueueHandler; a background QueueListener per
+log file does the actual disk writes, so callers never block on file I/O.
+"""
+import os
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Use path relative to this file's module root (Elf-ETL module)
+LOG_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs"
+)
+
+_listeners: list[QueueListener] = []
+
+
+def get_file_logger(name: str, filename: str, fmt: str, level: int = logging.INFO) -> logging.Logger:
+    """
+    Return logger `name` writing to logs/`filename` through a queue.
+    Handlers are installed only once per logger.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if logger.handlers:
+        return logger
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    fh = logging.FileHandler(os.path.join(LOG_DIR, filename), delay=True)
+    fh.setFormatter(logging.Formatter(fmt))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, fh)
+    listener.start()
+    _listeners.append(listener)
+
+    logger.addHandler(QueueHandler(log_queue))
+    return logger
+
+
+@atexit.register
+def _stop_listeners():
+    # Drain pending records before the interpreter exits
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
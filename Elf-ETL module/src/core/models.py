@@ -20,6 +20,15 @@ class GenderEnum(str, Enum):
     FEMALE = "female"
 
 
+# goodness bucket (score * 10) -> (gift limit, coal kg); None keeps every gift
+_GOODNESS_TABLE: dict[int, tuple[int | None, int]] = {
+    1: (None, 10), 2: (None, 5), 3: (None, 3), 4: (None, 2),
+    5: (1, 0), 6: (1, 0),
+    7: (2, 0), 8: (2, 0),
+    9: (3, 0), 10: (3, 0),
+}
+
+
 class Child(SQLModel, table=True):
     """
     Represents a child who wrote a letter to Santa.
@@ -64,19 +73,10 @@ class Letter(SQLModel, table=True):
     
     @model_validator(mode='after')
     def validate_goodness_logic(self):
-        score = self.goodness_score
-        
-        if score <= 0.4:
-            self.coal_qty_kg = int(1 / score)
-        else:
-            self.coal_qty_kg = 0
-        
-        if 0.5 <= score <= 0.6:
-            self.gift_request = self.gift_request[:1]
-        elif 0.7 <= score <= 0.8:
-            self.gift_request = self.gift_request[:2]
-        elif 0.9 <= score <= 1.0:
-            self.gift_request = self.gift_request[:3]
+        # One table lookup per letter instead of a float comparison ladder
+        bucket = max(1, min(10, int(self.goodness_score * 10 + 0.5)))
+        gift_limit, self.coal_qty_kg = _GOODNESS_TABLE[bucket]
+        if gift_limit is not None:
+            self.gift_request = self.gift_request[:gift_limit]
         
         return self
-
@@ -0,0 +1,79 @@
+"""
+Rate Limiter for Elf-ETL.
+Proactive token-bucket throttling of LLM calls (requests + tokens per minute).
+"""
+import re
+import time
+import asyncio
+import threading
+
+# Gemini quota errors read "429 RESOURCE_EXHAUSTED ..."; whole tokens only, so
+# e.g. an id containing the digits 429 doesn't count
+RATE_LIMIT_PATTERN = re.compile(r"\b(?:429|RESOURCE_EXHAUSTED)\b")
+
+
+class RateLimiter:
+    """
+    Proactive token-bucket limiter for requests-per-minute and tokens-per-minute quotas.
+    Capacity refills continuously; callers only wait when the bucket is empty.
+    Safe to share between threads (`wait`) and coroutines (`acquire`).
+    """
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self.last_update_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.available_request_capacity = min(
+            self.available_request_capacity + self.max_requests_per_minute * elapsed / 60,
+            self.max_requests_per_minute
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60,
+            self.max_tokens_per_minute
+        )
+        self.last_update_time = now
+
+    def _try_consume(self, est_tokens: int) -> float:
+        """Consume capacity if available and return 0, else return the seconds to wait."""
+        est_tokens = min(est_tokens, self.max_tokens_per_minute)
+        with self._lock:
+            self._refill()
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= est_tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= est_tokens
+                return 0.0
+            # Just long enough for the missing capacity to refill
+            request_wait = (1 - self.available_request_capacity) * 60 / self.max_requests_per_minute
+            token_wait = (est_tokens - self.available_token_capacity) * 60 / self.max_tokens_per_minute
+            return max(request_wait, token_wait, 0.01)
+
+    def wait(self, est_tokens: int = 1):
+        """Block the current thread until one request and `est_tokens` tokens are available."""
+        while (delay := self._try_consume(est_tokens)) > 0:
+            time.sleep(delay)
+
+    async def acquire(self, est_tokens: int = 1):
+        """Async version of `wait`: yields to the event loop while the bucket refills."""
+        while (delay := self._try_consume(est_tokens)) > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self):
+        """Halve the available capacity after a 429 so every worker backs off."""
+        with self._lock:
+            self.available_request_capacity /= 2
+            self.available_token_capacity /= 2
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if the exception comes from a 429 (quota exceeded) response."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    if getattr(error, "status", None) == "RESOURCE_EXHAUSTED":
+        return True
+    return RATE_LIMIT_PATTERN.search(str(error)) is not None
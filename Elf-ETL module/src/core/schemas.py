@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 try:
     from .models import CountryEnum, GenderEnum
@@ -6,8 +6,15 @@ except ImportError:
     from core.models import CountryEnum, GenderEnum
 
 
+# Extractions are immutable value objects: frozen, unknown LLM keys ignored,
+# enums stored as their plain string values (what the DB columns receive anyway).
+EXTRACTION_CONFIG = ConfigDict(frozen=True, extra="ignore", use_enum_values=True)
+
+
 class ChildData(BaseModel):
     """Pydantic model for child identity data extraction."""
+    model_config = EXTRACTION_CONFIG
+
     name: str = Field(description="Child's first name")
     age: int = Field(ge=1, description="Child's age")
     city: Optional[str] = Field(default=None, description="City if mentioned")
@@ -24,6 +31,8 @@ class LetterExtraction(BaseModel):
     Composite model for extracting all information from a letter.
     Contains child identity + this year's behavior/requests.
     """
+    model_config = EXTRACTION_CONFIG
+
     child: ChildData = Field(description="Child identity information")
     
     # Per-letter data (behavior and requests for THIS year)
@@ -48,3 +57,20 @@ class LetterExtraction(BaseModel):
         description="Brief 1-2 sentence summary of the letter content"
     )
 
+
+class LetterExtractionRow(LetterExtraction):
+    """LetterExtraction tagged with the ROW id of its letter in a bundled prompt."""
+    row_id: int = Field(description="Id from the '---ROW id---' header of the letter")
+
+    def to_extraction(self) -> LetterExtraction:
+        """Drop the row id, keeping the plain extraction."""
+        return LetterExtraction.model_validate(self.model_dump(exclude={"row_id"}))
+
+
+class BatchExtraction(BaseModel):
+    """Bundled extraction: one LetterExtractionRow per letter of the prompt."""
+    model_config = EXTRACTION_CONFIG
+
+    items: list[LetterExtractionRow] = Field(
+        description="One extraction per ROW, each carrying that ROW's id"
+    )
@@ -0,0 +1,146 @@
+"""
+Anti-Grinch keyword matching for Elf-ETL.
+All spam keywords are compiled once into a multi-pattern matcher, so a
+letter is scanned in a single pass regardless of how many keywords exist.
+`build_matcher` compiles a custom keyword list the same way;
+`build_batch_matcher` / `find_spam_keywords` scan a whole batch of letters.
+
+Uses Intel Hyperscan (SIMD DFA, optional `hyperscan` package) when it is
+installed, and falls back to a pyahocorasick automaton otherwise.
+"""
+import re
+import threading
+from bisect import bisect_right
+from typing import Callable, Iterable, List, Optional
+
+import ahocorasick
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+SPAM_KEYWORDS = ["grinch", "i hate christmas", "stole christmas", "non mi piace il natale"]
+
+Matcher = Callable[[str], Optional[str]]
+BatchMatcher = Callable[[List[str]], List[Optional[str]]]
+
+# Joins letters for a batch scan: never part of a keyword, so no match spans two letters
+_ROW_SEPARATOR = "\x00"
+
+
+def _hyperscan_matcher(keywords: List[str]) -> Matcher:
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[re.escape(keyword).encode("utf-8") for keyword in keywords],
+        ids=list(range(len(keywords))),
+        elements=len(keywords),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(keywords)
+    )
+    # Hyperscan scratch space must not be shared between concurrent scans
+    local = threading.local()
+
+    def find(text: str) -> Optional[str]:
+        scratch = getattr(local, "scratch", None)
+        if scratch is None:
+            scratch = local.scratch = hyperscan.Scratch(database)
+        matches = []
+
+        def on_match(pattern_id, start, end, flags, context):
+            matches.append(pattern_id)
+            return True  # First match stops the scan
+
+        try:
+            database.scan(text.encode("utf-8"), match_event_handler=on_match, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            pass
+        return keywords[matches[0]] if matches else None
+
+    return find
+
+
+def _aho_corasick_automaton(keywords: List[str]):
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword.lower(), keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _aho_corasick_matcher(keywords: List[str]) -> Matcher:
+    automaton = _aho_corasick_automaton(keywords)
+
+    def find(text: str) -> Optional[str]:
+        for _end, keyword in automaton.iter(text.lower()):
+            return keyword
+        return None
+
+    return find
+
+
+def build_matcher(keywords: Iterable[str]) -> Matcher:
+    """
+    Compile `keywords` into a function returning the first keyword found in a
+    text (case-insensitive), or None.
+    """
+    keywords = list(keywords)
+    if not keywords:
+        # Nothing to match (an empty automaton can't be iterated)
+        return lambda text: None
+    if hyperscan is not None:
+        return _hyperscan_matcher(keywords)
+    return _aho_corasick_matcher(keywords)
+
+
+def _aho_corasick_batch_matcher(keywords: List[str]) -> BatchMatcher:
+    automaton = _aho_corasick_automaton(keywords)
+
+    def find_many(texts: List[str]) -> List[Optional[str]]:
+        lowered = [text.lower() for text in texts]
+        # Start offset of every letter inside the joined buffer
+        starts = []
+        position = 0
+        for text in lowered:
+            starts.append(position)
+            position += len(text) + len(_ROW_SEPARATOR)
+
+        found: List[Optional[str]] = [None] * len(texts)
+        # One pass over the whole batch; matches are reported in end order,
+        # so the first one seen for a letter is what `find` would return
+        for end, keyword in automaton.iter(_ROW_SEPARATOR.join(lowered)):
+            row = bisect_right(starts, end) - 1
+            if found[row] is None:
+                found[row] = keyword
+        return found
+
+    return find_many
+
+
+def build_batch_matcher(keywords: Iterable[str]) -> BatchMatcher:
+    """
+    Like `build_matcher`, for a whole batch of texts at once: returns a function
+    mapping a list of texts to the first keyword found in each (or None).
+    With pyahocorasick the batch is joined and scanned in a single automaton
+    pass; Hyperscan (already SIMD per call) scans letter by letter.
+    """
+    keywords = list(keywords)
+    if not keywords:
+        return lambda texts: [None] * len(texts)
+    if hyperscan is not None:
+        find = _hyperscan_matcher(keywords)
+        return lambda texts: [find(text) for text in texts]
+    return _aho_corasick_batch_matcher(keywords)
+
+
+_find_default = build_matcher(SPAM_KEYWORDS)
+_find_many_default = build_batch_matcher(SPAM_KEYWORDS)
+
+
+def find_spam_keyword(text: str) -> Optional[str]:
+    """Return the first spam keyword found in `text` (case-insensitive), or None."""
+    return _find_default(text)
+
+
+def find_spam_keywords(texts: List[str]) -> List[Optional[str]]:
+    """`find_spam_keyword` for every text of a batch, in one scan."""
+    return _find_many_default(texts)
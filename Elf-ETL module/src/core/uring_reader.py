@@ -0,0 +1,238 @@
+"""
+Async letter file reader for Elf-ETL.
+On Linux with the optional `liburing` package and ELF_USE_IO_URING=1, reads are
+queued to a background thread that batches them into io_uring submissions
+(one syscall for up to `max_batch` files) and resolves asyncio futures on completion.
+Everywhere else reads fall back to a worker thread (`asyncio.to_thread`).
+`read_text` is the shared blocking reader (mmap for larger files);
+`read_text_cached` adds an in-memory LRU keyed on path + mtime for re-runs
+(small letters only, so the cache stays within a few tens of MiB).
+"""
+import os
+import mmap
+import asyncio
+import queue
+import threading
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+USE_IO_URING = os.getenv("ELF_USE_IO_URING", "false").lower() in ("1", "true", "yes")
+
+# Below this size a plain read() beats the mmap/munmap setup cost
+MMAP_MIN_BYTES = 4096
+
+
+def _decode(data: bytes) -> str:
+    """UTF-8 decode with the same newline translation as open(..., "r")."""
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_text(file_path) -> str:
+    """
+    Read a letter file as UTF-8 text.
+    Files of MMAP_MIN_BYTES or more are mapped read-only and copied out of the
+    page cache in one slice instead of going through a buffered read.
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            return _decode(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            return _decode(mm[:])
+
+
+def read_head(file_path, size: int) -> str:
+    """
+    Read only the first `size` bytes of a letter file as text (for quick checks).
+    Undecodable bytes, e.g. a UTF-8 sequence cut at the boundary, are dropped.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read(size)
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+
+# Only letters up to this size are cached: CACHE_ENTRIES * CACHE_MAX_BYTES bounds
+# the cache (~16 MiB of text) instead of CACHE_ENTRIES * MAX_LETTER_BYTES
+CACHE_ENTRIES = 4096
+CACHE_MAX_BYTES = MMAP_MIN_BYTES
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _read_cached(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/size are part of the key only: an edited file misses the cache
+    return read_text(path)
+
+
+def read_text_cached(file_path) -> str:
+    """
+    `read_text` with an LRU cache, for letters re-read across pipeline re-runs.
+    A stat() per call keeps it correct when files change on disk.
+    Files larger than CACHE_MAX_BYTES are read without being cached.
+    """
+    path = os.fspath(file_path)
+    st = os.stat(path)
+    if st.st_size > CACHE_MAX_BYTES:
+        return read_text(path)
+    return _read_cached(path, st.st_mtime_ns, st.st_size)
+
+
+class UringBatchEngine:
+    """
+    Batches file reads into io_uring submissions from a single daemon thread.
+    Safe to call `read` from any event loop; results are delivered thread-safely.
+    """
+
+    def __init__(self, entries: int = 64, max_batch: int = 32):
+        self.max_batch = min(max_batch, entries)
+        self._ring = liburing.Ring()
+        liburing.io_uring_queue_init(entries, self._ring, 0)
+        self._cqe = liburing.Cqe()
+        self._requests = queue.Queue()
+        # user_data -> in-flight read; ids are never reused, so a completion from a
+        # batch that failed halfway can't be matched to a newer request
+        self._pending = {}
+        self._next_id = 0
+        self._thread = threading.Thread(target=self._loop, name="ElfUring", daemon=True)
+        self._thread.start()
+
+    async def read(self, file_path) -> str:
+        """Read a whole file as UTF-8 text through the ring."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests.put((str(file_path), loop, future))
+        return await future
+
+    @staticmethod
+    def _resolve(loop, future, result=None, error: Optional[BaseException] = None):
+        def _set():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        loop.call_soon_threadsafe(_set)
+
+    def _next_batch(self) -> list:
+        # Block for the first request, then drain whatever else is already queued
+        batch = [self._requests.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._submit_batch(batch)
+            except Exception as e:
+                # Never let the thread die: fail this batch and keep serving.
+                # Futures already resolved are skipped by _resolve.
+                for _, loop, future in batch:
+                    self._resolve(loop, future, error=e)
+
+    def _queue_read(self, read: dict):
+        # One SQE for the bytes still missing, starting at the current offset
+        request_id = self._next_id
+        self._next_id += 1
+        read["chunk"] = bytearray(read["size"] - read["offset"])
+        sqe = liburing.io_uring_get_sqe(self._ring)
+        liburing.io_uring_prep_read(sqe, read["fd"], read["chunk"], read["offset"])
+        liburing.io_uring_sqe_set_data64(sqe, request_id)
+        self._pending[request_id] = read
+
+    def _submit_batch(self, batch: list):
+        queued = False
+        for path, loop, future in batch:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError as e:
+                self._resolve(loop, future, error=e)
+                continue
+            try:
+                size = os.fstat(fd).st_size
+            except OSError as e:
+                os.close(fd)
+                self._resolve(loop, future, error=e)
+                continue
+            if size == 0:
+                os.close(fd)
+                self._resolve(loop, future, "")
+                continue
+            read = {"fd": fd, "size": size, "offset": 0, "parts": [], "loop": loop, "future": future}
+            try:
+                self._queue_read(read)
+            except Exception:
+                os.close(fd)
+                raise
+            queued = True
+
+        if not queued:
+            return
+        liburing.io_uring_submit(self._ring)
+
+        # Also drains completions left in flight by an earlier failed batch
+        while self._pending:
+            liburing.io_uring_wait_cqe(self._ring, self._cqe)
+            entry = self._cqe[0]
+            request_id = liburing.io_uring_cqe_get_data64(entry)
+            res = entry.res
+            liburing.io_uring_cqe_seen(self._ring, entry)
+            read = self._pending.pop(request_id, None)
+            if read is None:
+                continue
+            if res < 0:
+                os.close(read["fd"])
+                self._resolve(read["loop"], read["future"], error=OSError(-res, os.strerror(-res)))
+                continue
+            read["parts"].append(bytes(read["chunk"][:res]))
+            read["offset"] += res
+            if res and read["offset"] < read["size"]:
+                # Short read: ask for the rest instead of returning a truncated letter
+                self._queue_read(read)
+                liburing.io_uring_submit(self._ring)
+                continue
+            # Done, or res == 0 (EOF: the file shrank after fstat)
+            os.close(read["fd"])
+            try:
+                self._resolve(read["loop"], read["future"], _decode(b"".join(read["parts"])))
+            except UnicodeDecodeError as e:
+                self._resolve(read["loop"], read["future"], error=e)
+
+
+_engine: Optional[UringBatchEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_uring_engine() -> Optional[UringBatchEngine]:
+    """Return the shared io_uring engine, or None when it is disabled/unavailable."""
+    global _engine, USE_IO_URING
+    if not USE_IO_URING or liburing is None:
+        return None
+    with _engine_lock:
+        if _engine is None:
+            try:
+                _engine = UringBatchEngine()
+            except OSError:
+                # io_uring blocked (old kernel, seccomp): stay on the thread fallback
+                USE_IO_URING = False
+                return None
+    return _engine
+
+
+async def read_text_async(file_path) -> str:
+    """Read a letter file as UTF-8 text without blocking the event loop."""
+    engine = get_uring_engine()
+    if engine is not None:
+        return await engine.read(file_path)
+    return await asyncio.to_thread(read_text, file_path)
@@ -3,22 +3,97 @@ Information Extractor Module for Elf-ETL.
 Uses datapizza-ai to extract structured data from letters.
 """
 import os
+import re
+import asyncio
+import hashlib
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 from datetime import datetime
 from dotenv import load_dotenv
 from datapizza.clients.google import GoogleClient
 
-import logging
 try:
-    from schemas import LetterExtraction, ChildData
-    from models import Child, Letter, CountryEnum, GenderEnum
+    from core.schemas import LetterExtraction, ChildData, BatchExtraction
+    from core.models import Child, Letter, CountryEnum, GenderEnum
+    from core.llm_cache import LLMCache, EmbeddingCache
+    from core.spam import find_spam_keyword
+    from core.uring_reader import read_text, read_text_async
+    from core.logging_utils import get_file_logger
+    from core.llm_client import get_gemini_client
 except ImportError:
-    from .schemas import LetterExtraction, ChildData
-    from .models import Child, Letter, CountryEnum, GenderEnum
+    from .core.schemas import LetterExtraction, ChildData, BatchExtraction
+    from .core.models import Child, Letter, CountryEnum, GenderEnum
+    from .core.llm_cache import LLMCache, EmbeddingCache
+    from .core.spam import find_spam_keyword
+    from .core.uring_reader import read_text, read_text_async
+    from .core.logging_utils import get_file_logger
+    from .core.llm_client import get_gemini_client
 
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-004"
+
+# Cheap keyword scan used to double-check semantic cache hits
+COUNTRY_KEYWORDS = {
+    CountryEnum.ITALY: ("italy", "italia"),
+    CountryEnum.USA: ("usa", "united states", "america"),
+    CountryEnum.CHINA: ("china", "cina"),
+    CountryEnum.RUSSIA: ("russia", "россия"),
+    CountryEnum.BRAZIL: ("brazil", "brasil"),
+    CountryEnum.AUSTRALIA: ("australia",),
+}
+# Whole words only: "scusa"/"causa" must not count as "usa", "cucina" as "cina"
+COUNTRY_PATTERNS = {
+    country: re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b")
+    for country, keywords in COUNTRY_KEYWORDS.items()
+}
+
+
+def _mentions(term: str, text_lower: str) -> bool:
+    """True if `term` appears in `text_lower` as a whole word (case-insensitive)."""
+    term = term.strip().lower()
+    return bool(term) and re.search(r"\b" + re.escape(term) + r"\b", text_lower) is not None
+
+EXTRACTION_RULES = """IMPORTANT RULES:
+        1. Detect if this is SPAM (from "Il Grinch", "The Grinch", etc.) - if so, set is_spam=True
+        2. For country: use one of [italy, usa, china, russia, brazil, australia], or "unknown" if different
+        3. For goodness_score: analyze the behavior described:
+        - 0.9-1.0: Very good (helps parents, kind, polite)
+        - 0.7-0.8: Good (mostly positive behavior)
+        - 0.5-0.6: Neutral (mixed behavior)
+        - 0.3-0.4: Somewhat naughty
+        - 0.1-0.2: Very naughty
+        4. Extract ALL gift requests mentioned
+        5. Infer gender from the name if not explicitly stated"""
+
+# Constant prompt head/tail built once: only the letter text varies per call,
+# which also keeps the prefix stable for Gemini's implicit prompt caching
+EXTRACTION_PROMPT_PREFIX = f"""Analyze this letter to Santa Claus and extract structured information.
+
+        {EXTRACTION_RULES}
+
+        LETTER TEXT:
+        """
+EXTRACTION_PROMPT_SUFFIX = """
+        """
+
+
+# Frozen template for heuristic spam, validated once at import
+SPAM_EXTRACTION = LetterExtraction(
+    child=ChildData(
+        name="Unknown (Spam)", 
+        age=999, 
+        city="Unknown", 
+        country=CountryEnum.UNKNOWN, # Use Enum if possible or defaults
+        gender=GenderEnum.MALE
+    ),
+    goodness_score=0.1,
+    gift_request=[],
+    is_spam=True,
+    spam_reason=None,
+    letter_summary="Automatically blocked by heuristic filter."
+)
+
 
 class LetterExtractor:
     """
@@ -26,80 +101,245 @@ class LetterExtractor:
     Returns both Child and Letter objects ready for database insertion.
     """
     
-    def __init__(self, model_name: str = "gemini-2.0-flash-exp"):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+    def __init__(self, model_name: str = "gemini-2.0-flash-exp", client: Optional[GoogleClient] = None):
+        if client is None and not os.getenv("GEMINI_API_KEY"):
             raise ValueError("GEMINI_API_KEY not found in environment variables.")
         
-        self.client = GoogleClient(
-            api_key=api_key,
-            model=model_name
+        self.model_name = model_name
+        # Shared per-process client unless one is injected (one connection pool for all extractors)
+        self.client = client or get_gemini_client(model_name)
+        # Exact-match cache: identical prompts skip the LLM round-trip
+        self.cache = LLMCache()
+        # Semantic cache: near-duplicate letters reuse a previous extraction
+        self.semantic_cache = EmbeddingCache(
+            embed_fn=lambda text: self.client.embed(text, model_name=EMBEDDING_MODEL)
         )
         self.letters_dir = Path("data/test_letters")
         
-        # Setup Tracing / Logging
-        self.logger = logging.getLogger("ElfTrace")
-        self.logger.setLevel(logging.INFO)
-        # Create handlers if not exist
-        if not self.logger.handlers:
-            # Use path relative to this file's module root (Elf-ETL module)
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            log_dir = os.path.join(base_dir, "logs")
-            os.makedirs(log_dir, exist_ok=True)
-            fh = logging.FileHandler(os.path.join(log_dir, "spam_tracing.log"))
-            fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-            self.logger.addHandler(fh)
+        # Setup Tracing / Logging (queued, written by a background thread)
+        self.logger = get_file_logger(
+            "ElfTrace", "spam_tracing.log", '%(asctime)s - %(levelname)s - %(message)s'
+        )
 
     def _build_prompt(self, letter_text: str) -> str:
         """Build the extraction prompt."""
-        return f"""Analyze this letter to Santa Claus and extract structured information.
+        return EXTRACTION_PROMPT_PREFIX + letter_text + EXTRACTION_PROMPT_SUFFIX
 
-        IMPORTANT RULES:
-        1. Detect if this is SPAM (from "Il Grinch", "The Grinch", etc.) - if so, set is_spam=True
-        2. For country: use one of [italy, usa, china, russia, brazil, australia], or "unknown" if different
-        3. For goodness_score: analyze the behavior described:
-        - 0.9-1.0: Very good (helps parents, kind, polite)
-        - 0.7-0.8: Good (mostly positive behavior)
-        - 0.5-0.6: Neutral (mixed behavior)
-        - 0.3-0.4: Somewhat naughty
-        - 0.1-0.2: Very naughty
-        4. Extract ALL gift requests mentioned
-        5. Infer gender from the name if not explicitly stated
+    def _build_batch_prompt(self, rows: List[Tuple[int, str]]) -> str:
+        """Build a single prompt asking for one extraction per (row_id, letter text) row."""
+        letters = "\n".join(f"---ROW {row_id}---\n{text}" for row_id, text in rows)
+        return f"""Analyze each of the following {len(rows)} letters to Santa Claus and extract structured information.
+        Each letter starts with a ---ROW id--- header. Output a JSON object whose "items" array has exactly {len(rows)} objects, one per ROW, each with "row_id" set to that ROW's id.
 
-        LETTER TEXT:
-        {letter_text}
+        {EXTRACTION_RULES}
+
+        {letters}
         """
 
+    def _cache_key(self, letter_text: str) -> str:
+        """Exact-cache key of the single-letter prompt."""
+        prompt = self._build_prompt(letter_text)
+        return hashlib.sha256((self.model_name + prompt).encode("utf-8")).hexdigest()
+
+    def _spam_extraction(self, spam_reason: str) -> LetterExtraction:
+        """Dummy extraction for heuristic spam, built without calling the LLM."""
+        # Copy of the prevalidated template: no schema validation on the spam path
+        return SPAM_EXTRACTION.model_copy(update={"spam_reason": spam_reason})
+
     def _is_spam_heuristic(self, text: str) -> Tuple[bool, Optional[str]]:
         """
         Fast heuristic check for spam keywords to avoid LLM costs.
         Returns (is_spam, reason).
         """
-        text_lower = text.lower()
-        spam_keywords = ["grinch", "i hate christmas", "stole christmas", "non mi piace il natale"]
-        
-        for keyword in spam_keywords:
-            if keyword in text_lower:
-                return True, f"Keyword match: '{keyword}'"
+        keyword = find_spam_keyword(text)
+        if keyword:
+            return True, f"Keyword match: '{keyword}'"
         return False, None
 
-    def extract_from_text(self, letter_text: str) -> LetterExtraction:
-        """Extract data from a single letter text."""
-        prompt = self._build_prompt(letter_text)
+    def _matches_letter(self, cached_json: str, letter_text: str) -> bool:
+        """
+        Lexical guard for semantic cache hits, on whole words: the cached child's
+        name, age and every gift must appear in the letter, and its country must
+        agree with a keyword scan. goodness_score can't be checked lexically and
+        relies on the similarity threshold.
+        """
+        extraction = LetterExtraction.model_validate_json(cached_json)
+        text_lower = letter_text.lower()
+        if not _mentions(extraction.child.name, text_lower):
+            return False
+        if not _mentions(str(extraction.child.age), text_lower):
+            return False
+        if not all(_mentions(gift, text_lower) for gift in extraction.gift_request):
+            return False
+        
+        mentioned = {
+            country for country, pattern in COUNTRY_PATTERNS.items()
+            if pattern.search(text_lower)
+        }
+        if extraction.child.country == CountryEnum.UNKNOWN:
+            return not mentioned
+        return extraction.child.country in mentioned
+
+    def _lookup_caches(self, letter_text: str) -> Tuple[str, Optional[list], Optional[LetterExtraction]]:
+        """
+        Try the exact cache (prompt hash), then the semantic cache.
+        Returns (key, embedding, extraction); extraction is None on a miss.
+        """
+        key = self._cache_key(letter_text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return key, None, LetterExtraction.model_validate_json(cached)
+        
+        vector = None
+        try:
+            vector = self.semantic_cache.embed(letter_text)
+            cached = self.semantic_cache.lookup(
+                vector, accept=lambda value: self._matches_letter(value, letter_text)
+            )
+            if cached is not None:
+                return key, vector, LetterExtraction.model_validate_json(cached)
+        except Exception as e:
+            self.logger.warning(f"Semantic cache unavailable: {e}")
+        return key, vector, None
+
+    def _store_caches(self, key: str, vector: Optional[list], extraction: LetterExtraction):
+        """Store a live LLM extraction in both cache tiers."""
+        extraction_json = extraction.model_dump_json()
+        self.cache.set(key, extraction_json)
+        if vector is not None:
+            self.semantic_cache.add(vector, extraction_json)
+
+    def _extract_live(self, letter_text: str, key: str, vector: Optional[list]) -> LetterExtraction:
+        """Single-letter LLM call after a cache miss; the result fills both cache tiers."""
         response = self.client.structured_response(
-            input=prompt,
+            input=self._build_prompt(letter_text),
             output_cls=LetterExtraction
         )
-        return response.structured_data[0]
+        extraction = response.structured_data[0]
+        self._store_caches(key, vector, extraction)
+        return extraction
+
+    def extract_from_text(self, letter_text: str) -> LetterExtraction:
+        """Extract data from a single letter text (caches first, then the LLM)."""
+        key, vector, extraction = self._lookup_caches(letter_text)
+        if extraction is not None:
+            return extraction
+        return self._extract_live(letter_text, key, vector)
+
+    async def aextract_from_text(self, letter_text: str) -> LetterExtraction:
+        """Async version of `extract_from_text`: the LLM call does not block the event loop."""
+        key, vector, extraction = await asyncio.to_thread(self._lookup_caches, letter_text)
+        if extraction is not None:
+            return extraction
+        
+        response = await self.client.a_structured_response(
+            input=self._build_prompt(letter_text),
+            output_cls=LetterExtraction
+        )
+        extraction = response.structured_data[0]
+        self._store_caches(key, vector, extraction)
+        return extraction
+
+    def _extract_or_error(self, letter_text: str, key: str, vector: Optional[list]):
+        """`_extract_live` that returns the exception instead of raising it."""
+        try:
+            return self._extract_live(letter_text, key, vector)
+        except Exception as e:
+            return e
+
+    def extract_batch_bundled(
+        self,
+        letter_texts: List[str],
+        k: int = 8,
+        names: Optional[List[str]] = None
+    ) -> List[Union[LetterExtraction, Exception]]:
+        """
+        Extract data from many letters packing up to `k` letters per LLM call.
+        Heuristic spam and cache hits (exact or semantic) never reach the LLM.
+        Returns one LetterExtraction per input text, in the same order; a letter
+        that could not be extracted gets its exception instead, so one failure
+        doesn't discard the rest. `names` (e.g. file names) are only used for logging.
+        """
+        names = names or [f"letter {i}" for i in range(len(letter_texts))]
+        extractions: List[Union[LetterExtraction, Exception, None]] = [None] * len(letter_texts)
+        pending = []  # (index, cache key, embedding) of letters that need the LLM
+        
+        for i, text in enumerate(letter_texts):
+            is_spam, spam_reason = self._is_spam_heuristic(text)
+            if is_spam:
+                self.logger.warning(f"SPAM DETECTED (Heuristic) in {names[i]}: {spam_reason}")
+                extractions[i] = self._spam_extraction(spam_reason)
+                continue
+            try:
+                key, vector, cached = self._lookup_caches(text)
+            except Exception as e:
+                extractions[i] = e
+                continue
+            if cached is not None:
+                extractions[i] = cached
+            else:
+                pending.append((i, key, vector))
+        
+        for start in range(0, len(pending), k):
+            window = pending[start:start + k]
+            rows = [i for i, _, _ in window]
+            try:
+                response = self.client.structured_response(
+                    input=self._build_batch_prompt([(i, letter_texts[i]) for i in rows]),
+                    output_cls=BatchExtraction
+                )
+                # Match rows by id, not position: the model may reorder them
+                by_row = {item.row_id: item for item in response.structured_data[0].items}
+                if set(by_row) != set(rows):
+                    raise ValueError(f"expected rows {rows}, got {sorted(by_row)}")
+                for i, key, vector in window:
+                    extraction = by_row[i].to_extraction()
+                    self._store_caches(key, vector, extraction)
+                    extractions[i] = extraction
+            except Exception as e:
+                # Fall back to one call per letter for this window; failures stay per letter
+                self.logger.warning(f"Bundled extraction failed ({e}), retrying letters one by one")
+                for i, key, vector in window:
+                    extractions[i] = self._extract_or_error(letter_texts[i], key, vector)
+            
+            for i in rows:
+                if not isinstance(extractions[i], Exception):
+                    self.logger.info(f"Processed valid letter: {names[i]}")
+        
+        return extractions
+
+    def _build_models(self, letter_text: str, extraction: LetterExtraction) -> Tuple[Child, Letter]:
+        """Create the Child (identity only) and Letter (behavior/requests) SQLModel objects."""
+        child = Child(
+            name=extraction.child.name,
+            age=extraction.child.age,
+            city=extraction.child.city,
+            country=extraction.child.country,
+            gender=extraction.child.gender
+        )
+        letter = Letter(
+            content=letter_text,
+            is_spam=extraction.is_spam,
+            spam_reason=extraction.spam_reason,
+            received_at=datetime.utcnow(),
+            goodness_score=extraction.goodness_score,
+            # Own list: extractions (e.g. the spam template) may be shared
+            gift_request=list(extraction.gift_request)
+        )
+        return child, letter
     
     def extract_from_file(self, file_path: Path) -> Tuple[Child, Letter, LetterExtraction]:
         """
         Extract data from a letter file and return SQLModel objects and raw extraction.
         Returns (Child, Letter, LetterExtraction) tuple.
         """
-        with open(file_path, "r", encoding="utf-8") as f:
-            letter_text = f.read()
-        
+        return self.extract_from_content(read_text(file_path), file_path)
+
+    def extract_from_content(self, letter_text: str, file_path: Path) -> Tuple[Child, Letter, LetterExtraction]:
+        """
+        Same as `extract_from_file` for a letter already in memory (e.g. prefetched
+        concurrently with other reads). `file_path` is only used for logging.
+        """
         # 1. Heuristic Check (Anti-Grinch Filter)
         is_spam_heuristic, spam_reason = self._is_spam_heuristic(letter_text)
         
@@ -107,20 +347,7 @@ class LetterExtractor:
             self.logger.warning(f"SPAM DETECTED (Heuristic) in {file_path.name}: {spam_reason}")
             
             # Create a dummy extraction for spam to skip LLM cost
-            extraction = LetterExtraction(
-                child=ChildData(
-                    name="Unknown (Spam)", 
-                    age=999, 
-                    city="Unknown", 
-                    country=CountryEnum.UNKNOWN, # Use Enum if possible or defaults
-                    gender=GenderEnum.MALE
-                ),
-                goodness_score=0.1,
-                gift_request=[],
-                is_spam=True,
-                spam_reason=spam_reason,
-                letter_summary="Automatically blocked by heuristic filter."
-            )
+            extraction = self._spam_extraction(spam_reason)
             
             # For heuristic spam, we might still want to return objects, 
             # OR logic in caller should decide to skip saving "Unknown" children.
@@ -130,40 +357,39 @@ class LetterExtractor:
             extraction = self.extract_from_text(letter_text)
             self.logger.info(f"Processed valid letter: {file_path.name}")
         
-        # Create Child SQLModel object (identity only)
-        child = Child(
-            name=extraction.child.name,
-            age=extraction.child.age,
-            city=extraction.child.city,
-            country=extraction.child.country,
-            gender=extraction.child.gender
-        )
+        child, letter = self._build_models(letter_text, extraction)
+        return child, letter, extraction
+
+    async def aextract_from_file(self, file_path: Path) -> Tuple[Child, Letter, LetterExtraction]:
+        """Async version of `extract_from_file`, for concurrent processing of many letters."""
+        letter_text = await read_text_async(file_path)
         
-        # Create Letter SQLModel object (includes behavior/requests)
-        letter = Letter(
-            content=letter_text,
-            is_spam=extraction.is_spam,
-            spam_reason=extraction.spam_reason,
-            received_at=datetime.utcnow(),
-            goodness_score=extraction.goodness_score,
-            gift_request=extraction.gift_request
-        )
+        is_spam_heuristic, spam_reason = self._is_spam_heuristic(letter_text)
+        if is_spam_heuristic:
+            self.logger.warning(f"SPAM DETECTED (Heuristic) in {file_path.name}: {spam_reason}")
+            extraction = self._spam_extraction(spam_reason)
+        else:
+            extraction = await self.aextract_from_text(letter_text)
+            self.logger.info(f"Processed valid letter: {file_path.name}")
         
+        child, letter = self._build_models(letter_text, extraction)
         return child, letter, extraction
     
     def extract_batch(
         self,
         limit: Optional[int] = None,
         only_valid: bool = False,
-        only_spam: bool = False
+        only_spam: bool = False,
+        k: int = 8
     ) -> List[Tuple[Child, Letter, LetterExtraction]]:
         """
-        Extract data from multiple letters.
+        Extract data from multiple letters, bundling up to `k` letters per LLM call.
         
         Args:
             limit: Max number of letters to process (None = all)
             only_valid: If True, only process child_*.txt files
             only_spam: If True, only process grinch_*.txt files
+            k: Letters per bundled LLM request
         
         Returns:
             List of (Child, Letter, LetterExtraction) tuples
@@ -172,11 +398,11 @@ class LetterExtractor:
         
         # Get files based on filters
         if only_valid:
-            files = list(self.letters_dir.glob("child_*.txt"))
+            files = sorted(self.letters_dir.glob("child_*.txt"))
         elif only_spam:
-            files = list(self.letters_dir.glob("grinch_*.txt"))
+            files = sorted(self.letters_dir.glob("grinch_*.txt"))
         else:
-            files = list(self.letters_dir.glob("*.txt"))
+            files = sorted(self.letters_dir.glob("*.txt"))
         
         # Apply limit
         if limit:
@@ -184,15 +410,32 @@ class LetterExtractor:
         
         print(f"📬 Processing {len(files)} letters...")
         
-        for i, file_path in enumerate(files):
-            try:
-                child, letter, extraction = self.extract_from_file(file_path)
+        for start in range(0, len(files), k):
+            window = []  # (position, file_path, text) of the readable files
+            for i, file_path in enumerate(files[start:start + k], start=start):
+                try:
+                    window.append((i, file_path, read_text(file_path)))
+                except Exception as e:
+                    print(f"  ✗ [{i+1}/{len(files)}] {file_path.name}: {e}")
+            if not window:
+                continue
+            
+            extractions = self.extract_batch_bundled(
+                [text for _, _, text in window], k=k, names=[file_path.name for _, file_path, _ in window]
+            )
+            for (i, file_path, text), extraction in zip(window, extractions):
+                if isinstance(extraction, Exception):
+                    print(f"  ✗ [{i+1}/{len(files)}] {file_path.name}: {extraction}")
+                    continue
+                child, letter = self._build_models(text, extraction)
                 results.append((child, letter, extraction))
                 status = "🛑 SPAM" if letter.is_spam else "✓ Valid"
                 print(f"  {status} [{i+1}/{len(files)}] {file_path.name}")
-            except Exception as e:
-                print(f"  ✗ [{i+1}/{len(files)}] {file_path.name}: {e}")
         
+        stats = self.cache.stats
+        semantic_stats = self.semantic_cache.stats
+        print(f"🗃️ LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(semantic: {semantic_stats['hits']} hits, {semantic_stats['misses']} misses)")
         return results
 
 
@@ -3,9 +3,13 @@ Loader Module for Elf-ETL.
 Responsible for saving extracted data to the database.
 """
 from sqlmodel import Session, select
-from models import Child, Letter
-from schemas import LetterExtraction
-from typing import Tuple
+try:
+    from core.models import Child, Letter
+    from core.schemas import LetterExtraction
+except ImportError:
+    from .core.models import Child, Letter
+    from .core.schemas import LetterExtraction
+from typing import List, Tuple
 
 class Loader:
     def __init__(self, session: Session):
@@ -13,21 +17,29 @@ class Loader:
 
     def load_letter(self, child: Child, letter: Letter) -> Tuple[Child, Letter]:
         """
-        Saves the child and letter to the database.
+        Saves the child and letter to the database in a single transaction.
         """
         # TODO: Implement duplicate check for Child based on name/city/etc.
         # For now, we assume every letter comes from a new child entry or we just insert blindly.
         # Ideally: existing_child = session.exec(select(Child).where(Child.name == child.name)).first()
         
-        # Add objects to session
-        self.session.add(child)
-        self.session.commit()
-        self.session.refresh(child)
-        
-        # Link letter to child
-        letter.child_id = child.id
-        self.session.add(letter)
+        self.load_letters([(child, letter)])
+        return child, letter
+
+    def load_letters(self, pairs: List[Tuple[Child, Letter]]) -> List[Tuple[Child, Letter]]:
+        """
+        Saves many (child, letter) pairs with one flush and one commit.
+        Children are inserted first so their generated ids can be linked to the letters.
+        """
+        if not pairs:
+            return pairs
+
+        self.session.add_all([child for child, _ in pairs])
+        self.session.flush()
+
+        for child, letter in pairs:
+            letter.child_id = child.id
+        self.session.add_all([letter for _, letter in pairs])
         self.session.commit()
-        self.session.refresh(letter)
         
-        return child, letter
+        return pairs
@@ -1,26 +1,69 @@
 """
 Main Entry Point for Elf-ETL.
-Orchestrates the Single File Pipeline execution.
+Orchestrates the Single File Pipeline execution, running several files
+concurrently while a shared rate limiter keeps LLM calls under the API quota.
+With ELF_BATCH_FLOW=1 the stage-at-a-time batch flow runs instead
+(pipeline.batch_flow, ELF_LLM_BATCH letters per LLM call).
 """
-import time
+import asyncio
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add src to pythonpath
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from core.database import reset_db
-from pipeline.flow import build_single_file_pipeline
+from sqlmodel import Session
 
-def main():
-    # 1. Initialize DB
-    max_retries = 5
+from core.database import engine, reset_db
+from core.rate_limiter import RateLimiter
+from pipeline.flow import build_single_file_pipeline, build_fast_single_file_run
+from pipeline.batch_flow import run_batch_flow
+
+CONCURRENCY = int(os.getenv("ELF_CONCURRENCY", "4"))  # Files processed in parallel
+LLM_RPM = float(os.getenv("ELF_LLM_RPM", "2"))  # Gemini requests per minute quota
+LLM_TPM = float(os.getenv("ELF_LLM_TPM", "1000000"))  # Gemini tokens per minute quota
+LLM_BATCH = int(os.getenv("ELF_LLM_BATCH", "1"))  # Letters bundled per LLM call (<= CONCURRENCY)
+# Direct stage calls instead of the FunctionalPipeline (set to false to debug the flow)
+FAST_PATH = os.getenv("ELF_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Whole set stage by stage (read all, filter all, bundled LLM, bulk insert)
+BATCH_FLOW = os.getenv("ELF_BATCH_FLOW", "false").lower() in ("1", "true", "yes")
+
+
+async def process_file(run_file, semaphore: asyncio.Semaphore, base_dir: Path, file_path: Path):
+    """Runs the single-file pipeline (`run_file(file_path)`) for one letter in a worker thread."""
+    async with semaphore:
+        relative_path = file_path.relative_to(base_dir)
+        print(f"\n📄 Processing: {relative_path}")
+        
+        try:
+            results = await asyncio.to_thread(run_file, file_path)
+            
+            # Check results to see what happened (optional)
+            log_result = results.get("log") or {}
+            if log_result.get("is_spam"):
+                print(f"   🚫 {log_result['spam_reason']}")
+            elif results.get("load") is not None:
+                print(f"   ✅ Letter Saved! ({relative_path})")
+            else:
+                print("   ⚠️ Unknown Result State")
+                
+        except Exception as e:
+            print(f"   💥 Error processing file {relative_path}: {e}")
+            # print full stack trace for debugging
+            import traceback
+            traceback.print_exc()
+
+
+def _reset_db_with_retry(max_retries: int = 5):
+    """Resets the DB, retrying while the server is still starting up."""
     for i in range(max_retries):
         try:
             print(f"🎄 Resetting & Initializing Database (Attempt {i+1}/{max_retries})...")
             reset_db()
-            break
+            return
         except Exception as e:
             if i == max_retries - 1:
                 print(f"💥 Failed to connect to DB after {max_retries} attempts: {e}")
@@ -28,84 +71,97 @@ def main():
             print(f"  ⏳ DB not ready yet, waiting 2s... ({e})")
             time.sleep(2)
 
-    # 2. Clear Logs
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_file = os.path.join(base_dir, "logs", "pipeline.log")
+
+def _truncate_log(log_file: str):
     if os.path.exists(log_file):
         print("🧹 Clearing pipeline log...")
         with open(log_file, "w") as f:
             f.truncate(0)
 
-    # 3. Build Pipeline
+
+def _build_pipeline(session: Session):
+    """Returns a `run_file(file_path) -> results` callable for one letter."""
+    rate_limiter = RateLimiter(LLM_RPM, LLM_TPM)
+    if FAST_PATH:
+        print("🚂 Building Single-File Fast Path...")
+        return build_fast_single_file_run(rate_limiter=rate_limiter, llm_batch_size=LLM_BATCH, session=session)
+
     print("🚂 Building Single-File Functional Pipeline...")
-    pipeline = build_single_file_pipeline()
-    
-    # 4. Define Test Files (Dynamic Scan)
-    data_dir = os.path.join(base_dir, "data", "test_letters")
-    test_files = []
-    if os.path.exists(data_dir):
-        for root, dirs, files in os.walk(data_dir):
-            for file in files:
-                if file.endswith(".txt"):
-                    # Get relative path from base_dir for the loop below
-                    abs_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(abs_path, base_dir)
-                    test_files.append(rel_path)
-    else:
+    pipeline = build_single_file_pipeline(rate_limiter=rate_limiter, llm_batch_size=LLM_BATCH, session=session)
+    # In DataPizza, initial_data keys match the node names and the value is
+    # passed to the node's _run method: FileReader._run takes 'file_path'.
+    return lambda file_path: pipeline.execute(initial_data={"read": {"file_path": file_path}})
+
+
+def _scan_files(data_dir: Path) -> list[Path]:
+    if not data_dir.exists():
         print(f"⚠️ Warning: Data directory not found at {data_dir}")
+        return []
+    return sorted(data_dir.rglob("*.txt"))
+
+
+async def batch_flow_main(log_file: str, data_dir: Path):
+    """ELF_BATCH_FLOW entry point: one stage-at-a-time pass over every letter."""
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        _, _, test_files = await asyncio.gather(
+            loop.run_in_executor(executor, _reset_db_with_retry),
+            loop.run_in_executor(executor, _truncate_log, log_file),
+            loop.run_in_executor(executor, _scan_files, data_dir),
+        )
+
+    print(f"📬 Starting Batch Flow over {len(test_files)} files (LLM batch: {max(LLM_BATCH, 1)})...")
+    counts = await asyncio.to_thread(
+        run_batch_flow, test_files,
+        rate_limiter=RateLimiter(LLM_RPM, LLM_TPM), llm_batch_size=max(LLM_BATCH, 1)
+    )
+    print(f"\n✨ Done: {counts['saved']} saved, {counts['spam']} spam, {counts['errors']} errors ✨")
+
+
+async def main_async():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    log_file = os.path.join(base_dir, "logs", "pipeline.log")
+    data_dir = Path(base_dir) / "data" / "test_letters"
+
+    if BATCH_FLOW:
+        await batch_flow_main(log_file, data_dir)
+        return
+
+    # 1-4. Startup steps are independent I/O waits: DB reset, log clear,
+    # pipeline build and file scan overlap in worker threads.
+    # Nothing touches the DB until the reset has finished (gather below).
+    # One shared session: letters are flushed as they load, committed once at the end
+    session = Session(engine, expire_on_commit=False)
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        _, _, run_file, test_files = await asyncio.gather(
+            loop.run_in_executor(executor, _reset_db_with_retry),
+            loop.run_in_executor(executor, _truncate_log, log_file),
+            loop.run_in_executor(executor, _build_pipeline, session),
+            loop.run_in_executor(executor, _scan_files, data_dir),
+        )
 
     if not test_files:
         print("⚠️ No .txt files found to process!")
     
-    # 4. Loop and Execute
-    print(f"📬 Starting Processing of {len(test_files)} files...")
-    
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # 5. Execute concurrently (the rate limiter replaces the fixed sleep between files)
+    print(f"📬 Starting Processing of {len(test_files)} files (concurrency: {CONCURRENCY})...")
     
-    for relative_path in test_files:
-        full_path = os.path.join(base_dir, relative_path)
-        print(f"\n📄 Processing: {relative_path}")
-        
-        try:
-            # We assume the "read" node takes "file_path" as argument.
-            # In DataPizza, initial_data keys match the node names.
-            # And the value is passed to the _run method.
-            # Our FileReader._run takes 'file_path'.
-            
-            # NOTE: With target_key not set on the first node, 
-            # the value of initial_data["read"] is passed as **kwargs or positional?
-            # Based on docs/tests, it's safer to pass a dict if expecting specific args,
-            # BUT our FileReader takes a single argument 'file_path'.
-            # Let's try passing the value directly for the node 'read'.
-            
-            results = pipeline.execute(initial_data={
-                "read": {"file_path": full_path} 
-                # passing a dict here means FileReader._run receives this dict as **kwargs?
-                # Or as the first argument?
-                # Our previous error suggested mismatched args.
-                # Let's rely on the fix in FileReader which accepts `file_path`.
-                # If we pass {"file_path": ...}, it should map to the argument `file_path`.
-            })
-            
-            # Check results to see what happened (optional)
-            if "log_spam" in results and results["log_spam"]:
-                print(f"   🚫 {results['log_spam']}")
-            elif "load" in results:
-                print(f"   ✅ Letter Saved!")
-            else:
-                print("   ⚠️ Unknown Result State")
-                
-        except Exception as e:
-            print(f"   💥 Error processing file: {e}")
-            # print full stack trace for debugging
-            import traceback
-            traceback.print_exc()
-
-        # Rate Limit spacing
-        print("   💤 Sleeping 35s to respect API Quota...")
-        time.sleep(35)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    try:
+        await asyncio.gather(*[
+            process_file(run_file, semaphore, Path(base_dir), file_path)
+            for file_path in test_files
+        ])
+        print("💾 Committing batch...")
+        session.commit()
+    finally:
+        session.close()
 
     print("\n✨ Batch Processing Completed! ✨")
 
+def main():
+    asyncio.run(main_async())
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,124 @@
+"""
+Batch Driver for Elf-ETL.
+Runs the single-file pipeline stages over many letters concurrently:
+file reads are prefetched asynchronously (up to 2 x `concurrency` ahead),
+LLM calls are awaited (up to `concurrency` letters in flight), DB writes
+run in worker threads.
+The shared rate limiter keeps Gemini under quota.
+
+Usage (from src/):
+    python -m pipeline.batch ../data/test_letters/*.txt --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# Add src to pythonpath
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+
+from core.database import engine, init_db
+from core.rate_limiter import RateLimiter
+from pipeline.components import (
+    FileReader, GrinchFilter, GrinchLogger,
+    LLMExtractor, DatabaseLoader
+)
+
+DEFAULT_CONCURRENCY = int(os.getenv("ELF_CONCURRENCY", "4"))
+LLM_RPM = float(os.getenv("ELF_LLM_RPM", "2"))  # Gemini requests per minute quota
+LLM_TPM = float(os.getenv("ELF_LLM_TPM", "1000000"))  # Gemini tokens per minute quota
+
+
+class BatchRunner:
+    """
+    Same stages as `build_single_file_pipeline`, driven asynchronously:
+    Read -> Filter -> GrinchLogger (spam) | LLMExtractor -> DatabaseLoader (valid)
+    """
+    def __init__(self, rate_limiter: RateLimiter | None = None, model_name: str = "gemini-1.5-flash"):
+        self.reader = FileReader()
+        self.grinch_filter = GrinchFilter()
+        self.grinch_logger = GrinchLogger()
+        self.extractor = LLMExtractor(model_name=model_name, rate_limiter=rate_limiter)
+        # Shared session: one transaction for the whole batch, committed in `run`
+        self.session = Session(engine, expire_on_commit=False)
+        self.loader = DatabaseLoader(session=self.session, received_at=datetime.utcnow())
+
+    async def process(self, semaphore: asyncio.Semaphore, prefetch: asyncio.Semaphore, file_path: Path) -> dict:
+        # The prefetch slot is held from the read until a worker slot frees up,
+        # so at most `prefetch` letters wait in memory ahead of the LLM
+        async with prefetch:
+            data = await self.reader.a_run(file_path=file_path)
+            await semaphore.acquire()
+        try:
+            data = self.grinch_filter.run(data=data)
+            if data["is_spam"]:
+                self.grinch_logger.run(data=data)
+                print(f"   🚫 {file_path.name}: {data['spam_reason']}")
+                return data
+
+            data = await self.extractor.extract_async(data)
+            await asyncio.to_thread(self.loader.run, data=data)
+            print(f"   ✅ Letter Saved! ({file_path.name})")
+            return data
+        finally:
+            semaphore.release()
+
+    async def run(self, paths: List[Path], concurrency: int = DEFAULT_CONCURRENCY) -> List[dict]:
+        """Process all `paths`, at most `concurrency` at a time. Failures are returned, not raised."""
+        semaphore = asyncio.Semaphore(concurrency)
+        # Reads run ahead of the LLM stage, but bounded: later letters are already
+        # in memory while earlier ones wait on the LLM, without loading them all
+        prefetch = asyncio.Semaphore(2 * concurrency)
+        paths = [Path(p) for p in paths]
+        results = await asyncio.gather(
+            *[self.process(semaphore, prefetch, p) for p in paths],
+            return_exceptions=True
+        )
+        for file_path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                print(f"   💥 Error processing file {file_path}: {result}")
+        try:
+            await asyncio.to_thread(self.loader.commit)
+        finally:
+            self.session.close()
+        return results
+
+
+async def run_batch(
+    paths: List[Path],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_limiter: RateLimiter | None = None
+) -> List[dict]:
+    """Run the extraction pipeline over `paths` concurrently."""
+    runner = BatchRunner(rate_limiter=rate_limiter)
+    return await runner.run(paths, concurrency=concurrency)
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Process letters concurrently through the Elf-ETL pipeline.")
+    parser.add_argument("paths", nargs="+", type=Path, help="Letter .txt files to process")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Letters in flight at once")
+    parser.add_argument("--rpm", type=float, default=LLM_RPM, help="Gemini requests per minute quota")
+    parser.add_argument("--tpm", type=float, default=LLM_TPM, help="Gemini tokens per minute quota")
+    args = parser.parse_args(argv)
+
+    init_db()
+    print(f"📬 Processing {len(args.paths)} letters (concurrency: {args.concurrency})...")
+    results = asyncio.run(run_batch(
+        args.paths,
+        concurrency=args.concurrency,
+        rate_limiter=RateLimiter(args.rpm, args.tpm)
+    ))
+
+    errors = sum(isinstance(r, Exception) for r in results)
+    spam = sum(1 for r in results if isinstance(r, dict) and r.get("is_spam"))
+    print(f"\n✨ Done: {len(results) - errors - spam} saved, {spam} spam, {errors} errors ✨")
+
+
+if __name__ == "__main__":
+    main()
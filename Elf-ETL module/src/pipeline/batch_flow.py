@@ -0,0 +1,113 @@
+"""
+Batch Pipeline Flow for Elf-ETL.
+Processes a whole set of letters stage by stage (batch-at-a-time) instead of
+executing the single-file pipeline once per file:
+Read all -> Filter all -> Log spam -> Bundled LLM extraction -> Bulk insert.
+`build_single_file_pipeline` stays available for debugging single letters.
+Enabled in main.py with ELF_BATCH_FLOW=1.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from core.database import engine
+from core.models import Child, Letter
+from core.rate_limiter import RateLimiter
+from core.spam import find_spam_keywords
+from pipeline.components import FileReader, BatchLLMExtractor, logger, spam_logger
+
+
+def run_batch_flow(
+    paths: List[Path],
+    rate_limiter: RateLimiter | None = None,
+    llm_batch_size: int = 5,
+    session_factory=lambda: Session(engine)
+) -> dict:
+    """
+    Run the ETL over `paths` one stage at a time.
+    Unreadable letters and failed extractions are counted as errors; every
+    letter that was extracted is still inserted.
+    Returns counts of saved, spam and failed letters.
+    """
+    paths = [Path(p) for p in paths]
+
+    # 1. Read every letter. FileReader already rejects empty/oversized/non-UTF-8
+    # files (and obvious keyword spam) without loading them
+    reader = FileReader()
+    records = []
+    errors = 0
+    for path in paths:
+        try:
+            records.append(reader.run(file_path=path))
+        except OSError as e:
+            logger.error(f"Read Error on {path}: {e}")
+            errors += 1
+
+    # 2. Anti-Grinch filter over the remaining column, then partition
+    keywords = find_spam_keywords([record["content"] for record in records])
+    for record, keyword in zip(records, keywords):
+        if keyword and not record.get("is_spam"):
+            record["is_spam"] = True
+            record["spam_reason"] = f"Keyword match: '{keyword}'"
+    spam = [record for record in records if record.get("is_spam")]
+    valid = [record for record in records if not record.get("is_spam")]
+
+    # 3. Log blocked letters
+    for record in spam:
+        spam_logger.info(f"BLOCKED: {record['file_path'].name} -> {record['spam_reason']}")
+
+    # 4. Bundled LLM extraction, `llm_batch_size` letters per call; a failed
+    # letter is counted and skipped, the rest of its window is kept
+    extractor = BatchLLMExtractor(rate_limiter=rate_limiter, batch_size=llm_batch_size)
+    extracted = []  # (record, extraction)
+    for start in range(0, len(valid), llm_batch_size):
+        window = valid[start:start + llm_batch_size]
+        extractions = extractor.extract_many(
+            [record["content"] for record in window], [record["file_path"] for record in window]
+        )
+        for record, extraction in zip(window, extractions):
+            if isinstance(extraction, Exception):
+                errors += 1
+            else:
+                extracted.append((record, extraction))
+
+    # 5. Bulk insert: one INSERT ... RETURNING for children, one for letters
+    if extracted:
+        child_rows = [
+            {
+                "name": extraction.child.name,
+                "age": extraction.child.age,
+                "city": extraction.child.city,
+                "country": extraction.child.country,
+                "gender": extraction.child.gender
+            }
+            for _, extraction in extracted
+        ]
+        now = datetime.utcnow()
+        with session_factory() as session:
+            child_ids = session.scalars(
+                insert(Child).returning(Child.id, sort_by_parameter_order=True),
+                child_rows
+            ).all()
+            letter_rows = [
+                {
+                    "content": record["content"],
+                    "is_spam": False,
+                    "received_at": now,
+                    "goodness_score": extraction.goodness_score,
+                    "gift_request": list(extraction.gift_request),
+                    "coal_qty_kg": 0,
+                    "child_id": child_id
+                }
+                for (record, extraction), child_id in zip(extracted, child_ids)
+            ]
+            session.execute(insert(Letter), letter_rows)
+            session.commit()
+
+    logger.info(
+        f"Batch flow: {len(extracted)} letters saved, {len(spam)} spam blocked, {errors} errors"
+    )
+    return {"saved": len(extracted), "spam": len(spam), "errors": errors}
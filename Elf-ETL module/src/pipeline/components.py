@@ -5,26 +5,51 @@ Defines atomic processing steps as Datapizza PipelineComponents.
 from typing import List, Tuple, Any
 from pathlib import Path
 from datetime import datetime
-import logging
+from concurrent.futures import Future
+import asyncio
+import threading
 import os
 
+from sqlalchemy import insert
+
 from datapizza.core.models import PipelineComponent
 from datapizza.clients.google import GoogleClient
 
 from core.models import Child, Letter, CountryEnum, GenderEnum
-from core.schemas import LetterExtraction, ChildData
+from core.schemas import LetterExtraction, ChildData, BatchExtraction
+from core.rate_limiter import RateLimiter, is_rate_limit_error
+from core.spam import find_spam_keyword, build_matcher
+from core.llm_client import get_gemini_client
+from core.uring_reader import read_head, read_text_cached, read_text_async
+from core.logging_utils import get_file_logger
+
+EST_TOKENS_PER_LETTER = 1000  # Prompt + letter + structured output, rough estimate
+MAX_RETRIES = 3  # Retries on 429 (rate limited) responses, paced by the rate limiter
+
+# Letters outside this size range are rejected from stat() alone, without reading them
+MIN_LETTER_BYTES = 1
+MAX_LETTER_BYTES = 1024 * 1024
+# Larger letters get a keyword check on this many leading bytes before the full read
+QUICK_REJECT_BYTES = 4096
+
+# Constant extraction instructions (stable prefix -> Gemini implicit prompt caching)
+PROMPT_PREFIX = """Analyze this letter to Santa Claus and extract structured information.
+        RULES:
+        1. Country: [italy, usa, china, russia, brazil, australia, unknown]
+        2. Goodness: 0.1-1.0 based on behavior
+        3. Extract GIFTS
+        4. Infer GENDER
+        
+        LETTER:
+        """
+PROMPT_SUFFIX = """
+        """
 
-# Setup Logger for Components
-logger = logging.getLogger("ElfPipeline")
-logger.setLevel(logging.INFO)
-if not logger.handlers:
-    # Use path relative to this file's module root (Elf-ETL module)
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    log_dir = os.path.join(base_dir, "logs")
-    os.makedirs(log_dir, exist_ok=True)
-    fh = logging.FileHandler(os.path.join(log_dir, "pipeline.log"))
-    fh.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logger.addHandler(fh)
+# Setup Loggers for Components (queued, written by background threads)
+logger = get_file_logger(
+    "ElfPipeline", "pipeline.log", '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+spam_logger = get_file_logger("GrinchLog", "grinch_blocked.log", '%(asctime)s - SPAM - %(message)s')
 
 
 class FileScanner(PipelineComponent):
@@ -37,10 +62,54 @@ class FileScanner(PipelineComponent):
 
 
 class FileReader(PipelineComponent):
-    """Reads content from a file path."""
+    """
+    Reads content from a file path (cached in memory until the file changes).
+    Obvious spam is classified before the text is loaded: an empty or oversized
+    file (stat only), a spam keyword in the first QUICK_REJECT_BYTES of a larger
+    letter, or a file that isn't valid UTF-8. Those come back with content ""
+    and 'is_spam' already set, which GrinchFilter keeps.
+    `keywords` should match the GrinchFilter's (default SPAM_KEYWORDS).
+    """
+    def __init__(self, keywords: List[str] | None = None):
+        super().__init__()
+        self._find_keyword = find_spam_keyword if keywords is None else build_matcher(keywords)
+
+    @staticmethod
+    def _rejected(file_path: Path, reason: str) -> dict:
+        logger.warning(f"SPAM detected in {Path(file_path).name}: {reason}")
+        return {"file_path": file_path, "content": "", "is_spam": True, "spam_reason": reason}
+
+    @staticmethod
+    def _size_check(file_path: Path) -> Tuple[int, str | None]:
+        size = os.stat(file_path).st_size
+        if size < MIN_LETTER_BYTES:
+            return size, "Size check: empty letter"
+        if size > MAX_LETTER_BYTES:
+            return size, f"Size check: {size} bytes"
+        return size, None
+
     def _run(self, file_path: Path) -> dict:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        size, reason = self._size_check(file_path)
+        if reason:
+            return self._rejected(file_path, reason)
+        if size > QUICK_REJECT_BYTES:
+            keyword = self._find_keyword(read_head(file_path, QUICK_REJECT_BYTES))
+            if keyword:
+                return self._rejected(file_path, f"Keyword match: '{keyword}'")
+        try:
+            content = read_text_cached(file_path)
+        except UnicodeDecodeError:
+            return self._rejected(file_path, "Encoding check: not UTF-8")
+        return {"file_path": file_path, "content": content}
+
+    async def _a_run(self, file_path: Path) -> dict:
+        _size, reason = self._size_check(file_path)
+        if reason:
+            return self._rejected(file_path, reason)
+        try:
+            content = await read_text_async(file_path)
+        except UnicodeDecodeError:
+            return self._rejected(file_path, "Encoding check: not UTF-8")
         return {"file_path": file_path, "content": content}
 
 
@@ -48,18 +117,23 @@ class GrinchFilter(PipelineComponent):
     """
     Heuristic Anti-Grinch Filter.
     Returns a dict with 'is_spam' flag and reason.
+    `keywords` replaces the default SPAM_KEYWORDS (compiled once, here).
     """
+    def __init__(self, keywords: List[str] | None = None):
+        super().__init__()
+        self._find_keyword = find_spam_keyword if keywords is None else build_matcher(keywords)
+
     def _run(self, data: dict) -> dict:
-        text = data["content"]
-        text_lower = text.lower()
-        spam_keywords = ["grinch", "i hate christmas", "stole christmas", "non mi piace il natale"]
-        
-        for keyword in spam_keywords:
-            if keyword in text_lower:
-                logger.warning(f"SPAM detected in {data['file_path'].name}: {keyword}")
-                data["is_spam"] = True
-                data["spam_reason"] = f"Keyword match: '{keyword}'"
-                return data
+        # Already rejected by FileReader (size/encoding/quick keyword check)
+        if data.get("is_spam"):
+            return data
+
+        keyword = self._find_keyword(data["content"])
+        if keyword:
+            logger.warning(f"SPAM detected in {data['file_path'].name}: {keyword}")
+            data["is_spam"] = True
+            data["spam_reason"] = f"Keyword match: '{keyword}'"
+            return data
         
         data["is_spam"] = False
         data["spam_reason"] = None
@@ -80,16 +154,6 @@ class GrinchLogger(PipelineComponent):
         reason = data["spam_reason"]
         
         # Log to dedicated spam log
-        spam_logger = logging.getLogger("GrinchLog")
-        if not spam_logger.handlers:
-             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-             log_dir = os.path.join(base_dir, "logs")
-             os.makedirs(log_dir, exist_ok=True)
-             fh = logging.FileHandler(os.path.join(log_dir, "grinch_blocked.log"))
-             fh.setFormatter(logging.Formatter('%(asctime)s - SPAM - %(message)s'))
-             spam_logger.addHandler(fh)
-             spam_logger.setLevel(logging.INFO)
-        
         spam_logger.info(f"BLOCKED: {file_name} -> {reason}")
         return data
 
@@ -98,105 +162,307 @@ class LLMExtractor(PipelineComponent):
     """
     Wraps the Gemini extraction logic.
     Only runs on valid letters.
+    An optional RateLimiter, shared between concurrent pipelines, paces the calls.
+    An injected `client` is used as is; otherwise the process-wide client for
+    `model_name` is reused (see core.llm_client).
     """
-    def __init__(self, model_name: str = "gemini-1.5-flash"):
+    def __init__(
+        self,
+        model_name: str = "gemini-1.5-flash",
+        rate_limiter: RateLimiter | None = None,
+        client: GoogleClient | None = None
+    ):
         super().__init__()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-             # In a real app we might handle this gracefully or fail fast
-             pass
-        self.client = GoogleClient(api_key=api_key, model=model_name)
+        self.rate_limiter = rate_limiter
+        self.client = client or get_gemini_client(model_name)
 
     def _build_prompt(self, letter_text: str) -> str:
-        return f"""Analyze this letter to Santa Claus and extract structured information.
-        RULES:
-        1. Country: [italy, usa, china, russia, brazil, australia, unknown]
-        2. Goodness: 0.1-1.0 based on behavior
-        3. Extract GIFTS
-        4. Infer GENDER
-        
-        LETTER:
-        {letter_text}
-        """
+        return PROMPT_PREFIX + letter_text + PROMPT_SUFFIX
 
-    def _run(self, *args, **kwargs) -> dict:
-        """
-        Expects 'data' dictionary from previous step.
-        """
+    @staticmethod
+    def _unwrap_data(args, kwargs) -> dict:
         # Unwrap data (robustness)
         if "data" in kwargs:
-             data = kwargs["data"]
+             return kwargs["data"]
         elif args:
-             data = args[0]
+             return args[0]
         else:
              # If completely empty, we can't do anything.
              # In linear pipeline, assuming dependency holds, we should get args[0]
              raise ValueError("Missing input data")
+
+    def _run(self, *args, **kwargs) -> dict:
+        """
+        Expects 'data' dictionary from previous step.
+        """
+        data = self._unwrap_data(args, kwargs)
         
         # SKIPPING LOGIC: If spam, skip extraction
         if data.get("is_spam", False):
             return data
 
-        text = data["content"]
-        file_path = data["file_path"]
-        
+        # Enrich data dict
+        data["extraction"] = self.extract_text(data["content"], data["file_path"])
+        return data
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """On a 429, shrink the shared bucket; retry while attempts are left."""
+        if not (self.rate_limiter and is_rate_limit_error(error)):
+            return False
+        self.rate_limiter.penalize()
+        return attempt < MAX_RETRIES
+
+    def extract_text(self, text: str, file_path: Any = None) -> LetterExtraction:
+        """One LLM call for one letter, paced by the rate limiter (retried on 429)."""
         prompt = self._build_prompt(text)
+        for attempt in range(MAX_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.wait(EST_TOKENS_PER_LETTER)
+            try:
+                response = self.client.structured_response(
+                    input=prompt,
+                    output_cls=LetterExtraction
+                )
+                return response.structured_data[0]
+            except Exception as e:
+                if self._should_retry(e, attempt):
+                    logger.warning(f"Rate limited on {file_path}, retrying ({attempt + 1}/{MAX_RETRIES})")
+                    continue
+                logger.error(f"LLM Error on {file_path}: {e}")
+                raise e
+
+    async def _a_run(self, data: dict) -> dict:
+        return await self.extract_async(data)
+
+    async def extract_async(self, data: dict) -> dict:
+        """
+        Async version of `_run`: awaits the Gemini call (and the rate limiter)
+        so many letters can be in flight at once. Retried on 429 like `extract_text`.
+        """
+        # SKIPPING LOGIC: If spam, skip extraction
+        if data.get("is_spam", False):
+            return data
+
+        prompt = self._build_prompt(data["content"])
+        for attempt in range(MAX_RETRIES + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(EST_TOKENS_PER_LETTER)
+            try:
+                response = await self.client.a_structured_response(
+                    input=prompt,
+                    output_cls=LetterExtraction
+                )
+                data["extraction"] = response.structured_data[0]
+                return data
+            except Exception as e:
+                if self._should_retry(e, attempt):
+                    logger.warning(f"Rate limited on {data['file_path']}, retrying ({attempt + 1}/{MAX_RETRIES})")
+                    continue
+                logger.error(f"LLM Error on {data['file_path']}: {e}")
+                raise e
+
+
+class BatchLLMExtractor(LLMExtractor):
+    """
+    LLMExtractor that bundles letters from concurrent pipeline runs into one call.
+    Each `_run` parks its letter in a shared buffer; the buffer is sent as a single
+    ROW-delimited prompt once `batch_size` letters wait or `max_wait` seconds pass,
+    and every caller gets its own extraction back (matched by row id).
+    If the bundled call fails or drops rows, the batch falls back to one call per letter.
+    """
+    def __init__(
+        self,
+        model_name: str = "gemini-1.5-flash",
+        rate_limiter: RateLimiter | None = None,
+        batch_size: int = 5,
+        max_wait: float = 2.0,
+        client: GoogleClient | None = None
+    ):
+        super().__init__(model_name=model_name, rate_limiter=rate_limiter, client=client)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[dict, Future]] = []
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def _build_batch_prompt(self, rows: List[Tuple[int, str]]) -> str:
+        letters = "\n".join(f"---ROW {row_id}---\n{text}" for row_id, text in rows)
+        return f"""Analyze each of the following {len(rows)} letters to Santa Claus and extract structured information.
+        Each letter starts with a ---ROW id--- header: return one item per ROW, with row_id set to that id.
+        RULES:
+        1. Country: [italy, usa, china, russia, brazil, australia, unknown]
+        2. Goodness: 0.1-1.0 based on behavior
+        3. Extract GIFTS
+        4. Infer GENDER
+        
+        LETTERS:
+        {letters}
+        """
+
+    def _run(self, *args, **kwargs) -> dict:
+        data = self._unwrap_data(args, kwargs)
+        
+        # SKIPPING LOGIC: If spam, skip extraction
+        if data.get("is_spam", False):
+            return data
+
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((data, future))
+            if len(self._pending) >= self.batch_size:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # The caller that fills the buffer sends it; the others just wait
+        if batch:
+            self._extract_batch(batch)
+        return future.result()
+
+    async def _a_run(self, data: dict) -> dict:
+        return await asyncio.to_thread(self._run, data)
+
+    def _take_pending(self) -> List[Tuple[dict, Future]]:
+        # Caller holds self._lock
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        """Timer callback: send whatever is buffered."""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._extract_batch(batch)
+
+    def _extract_bundle(self, texts: List[str]) -> List[LetterExtraction]:
+        """One bundled LLM call for `texts`; raises if it fails or drops rows."""
+        rows = list(enumerate(texts, start=1))
+        if self.rate_limiter:
+            self.rate_limiter.wait(EST_TOKENS_PER_LETTER * len(texts))
         try:
             response = self.client.structured_response(
-                input=prompt,
-                output_cls=LetterExtraction
+                input=self._build_batch_prompt(rows),
+                output_cls=BatchExtraction
             )
-            extraction = response.structured_data[0]
-            
-            # Enrich data dict
-            data["extraction"] = extraction
-            return data
         except Exception as e:
-            logger.error(f"LLM Error on {file_path}: {e}")
+            if self.rate_limiter and is_rate_limit_error(e):
+                self.rate_limiter.penalize()
             raise e
+        by_row = {item.row_id: item for item in response.structured_data[0].items}
+        if set(by_row) != {row_id for row_id, _ in rows}:
+            raise ValueError(f"expected {len(rows)} rows, got ids {sorted(by_row)}")
+        return [by_row[row_id].to_extraction() for row_id, _ in rows]
+
+    def extract_many(self, texts: List[str], file_paths: List[Any] | None = None) -> List[LetterExtraction | Exception]:
+        """
+        Extract `texts` (without buffering) in one bundled call,
+        falling back to one call per letter if the bundle fails.
+        A letter whose fallback call fails gets its exception in the result
+        list instead of aborting the others. `file_paths` are used for logging.
+        """
+        try:
+            return self._extract_bundle(texts)
+        except Exception as e:
+            logger.warning(f"Batched extraction of {len(texts)} letters failed ({e}), retrying one by one")
+        file_paths = file_paths or [None] * len(texts)
+        extractions = []
+        for text, file_path in zip(texts, file_paths):
+            try:
+                extractions.append(self.extract_text(text, file_path))
+            except Exception as err:
+                extractions.append(err)
+        return extractions
+
+    def _extract_batch(self, batch: List[Tuple[dict, Future]]):
+        try:
+            extractions = self._extract_bundle([data["content"] for data, _ in batch])
+        except Exception as e:
+            logger.warning(f"Batched extraction of {len(batch)} letters failed ({e}), retrying one by one")
+            for data, future in batch:
+                try:
+                    data["extraction"] = self.extract_text(data["content"], data["file_path"])
+                    future.set_result(data)
+                except Exception as err:
+                    future.set_exception(err)
+            return
+
+        for (data, future), extraction in zip(batch, extractions):
+            data["extraction"] = extraction
+            future.set_result(data)
 
 
 class DatabaseLoader(PipelineComponent):
     """
     Saves extracted data to DB.
-    Requires a DB session factory or similar injection.
+    Requires a DB session factory or similar injection:
+    - `session_factory`: one short transaction (single commit) per letter.
+    - `session`: a shared session for a whole batch. Each letter is flushed
+      inside a SAVEPOINT, so a failing letter doesn't poison the batch, and the
+      driver commits once at the end (see `commit`).
+    `received_at` stamps every letter with one batch timestamp; when omitted
+    each letter gets the current time.
     """
-    def __init__(self, session_factory):
+    def __init__(self, session_factory=None, session=None, received_at: datetime | None = None):
         super().__init__()
+        if session_factory is None and session is None:
+            raise ValueError("DatabaseLoader needs a session_factory or a shared session")
         self.session_factory = session_factory
+        self.session = session
+        self.received_at = received_at
+        # Sessions are not thread-safe and pipelines run concurrently
+        self._lock = threading.Lock()
 
     def _run(self, data: dict):
+        # SKIPPING LOGIC: spam letters never reach the DB
+        if data.get("is_spam", False):
+            return None
+
         extraction = data["extraction"]
         text = data["content"]
         
-        # Logic adapted from original loader
-        from sqlmodel import Session
+        # Child row values (inserted with RETURNING, no ORM object needed)
+        child_values = {
+            "name": extraction.child.name,
+            "age": extraction.child.age,
+            "city": extraction.child.city,
+            "country": extraction.child.country,
+            "gender": extraction.child.gender
+        }
+        # Create Letter
+        letter = Letter(
+            content=text,
+            is_spam=False, # We know it's valid if we are here
+            received_at=self.received_at or datetime.utcnow(),
+            goodness_score=extraction.goodness_score,
+            gift_request=extraction.gift_request
+        )
         
-        with self.session_factory() as session:
-            # Create Child
-            child = Child(
-                name=extraction.child.name,
-                age=extraction.child.age,
-                city=extraction.child.city,
-                country=extraction.child.country,
-                gender=extraction.child.gender
-            )
-            session.add(child)
-            session.commit()
-            session.refresh(child)
-            
-            # Create Letter
-            letter = Letter(
-                content=text,
-                is_spam=False, # We know it's valid if we are here
-                received_at=datetime.utcnow(),
-                goodness_score=extraction.goodness_score,
-                gift_request=extraction.gift_request,
-                child_id=child.id
-            )
-            session.add(letter)
-            session.commit()
-            session.refresh(letter)
-            
-            logger.info(f"SAVED: {child.name} (Letter ID: {letter.id})")
-            return letter
+        if self.session is not None:
+            with self._lock, self.session.begin_nested():
+                self._add(self.session, child_values, letter)
+            logger.info(f"SAVED: {extraction.child.name} (Letter ID: {letter.id})")
+        else:
+            with self.session_factory() as session:
+                self._add(session, child_values, letter)
+                logger.info(f"SAVED: {extraction.child.name} (Letter ID: {letter.id})")
+                session.commit()
+        return letter
+
+    @staticmethod
+    def _add(session, child_values: dict, letter: Letter):
+        # INSERT ... RETURNING hands back the new child id in the same round trip
+        letter.child_id = session.execute(insert(Child).returning(Child.id), child_values).scalar_one()
+        session.add(letter)
+        session.flush()
+
+    def commit(self):
+        """Commits the shared session (once per batch, called by the driver)."""
+        if self.session is not None:
+            with self._lock:
+                self.session.commit()
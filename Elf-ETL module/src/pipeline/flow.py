@@ -1,30 +1,86 @@
 """
 Pipeline Flow Definition.
-Assembles the FunctionalPipeline for Single File Processing.
+Assembles the FunctionalPipeline for Single File Processing, plus a
+straight-line fast path over the same stages for bulk runs.
 """
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
 from datapizza.pipeline import FunctionalPipeline, Dependency
 from core.database import engine
+from core.rate_limiter import RateLimiter
 from sqlmodel import Session
 
 from pipeline.components import (
     FileReader, GrinchFilter, GrinchLogger, 
-    LLMExtractor, DatabaseLoader
+    LLMExtractor, BatchLLMExtractor, DatabaseLoader
 )
 
-def build_single_file_pipeline():
+def _build_stages(rate_limiter: RateLimiter | None, llm_batch_size: int, session: Session | None):
+    """Instantiates the pipeline stages: (reader, filter, grinch logger, extractor, loader)."""
+    if llm_batch_size > 1:
+        extractor = BatchLLMExtractor(model_name="gemini-1.5-flash", rate_limiter=rate_limiter, batch_size=llm_batch_size)
+    else:
+        extractor = LLMExtractor(model_name="gemini-1.5-flash", rate_limiter=rate_limiter)
+    if session is not None:
+        # Same batch, same transaction: stamp all its letters once
+        loader = DatabaseLoader(session=session, received_at=datetime.utcnow())
+    else:
+        loader = DatabaseLoader(session_factory=lambda: Session(engine))
+    return FileReader(), GrinchFilter(), GrinchLogger(), extractor, loader
+
+
+def build_single_file_pipeline(
+    rate_limiter: RateLimiter | None = None,
+    llm_batch_size: int = 1,
+    session: Session | None = None
+):
     """
     Builds a pipeline that processes a single file.
     Flow (Linear with Skip Logic): 
     Read -> Filter -> GrinchLogger (conditional) -> LLMExtractor (conditional) -> DatabaseLoader (conditional)
+    The pipeline is stateless, so one instance can process several files concurrently;
+    pass a shared `rate_limiter` to keep the LLM calls under the API quota.
+    With `llm_batch_size` > 1, letters from concurrent executions are bundled
+    into a single LLM call (BatchLLMExtractor).
+    With a shared `session`, every execution writes into the same transaction
+    and the caller commits once at the end of the batch.
     """
+    reader, grinch_filter, grinch_logger, extractor, loader = _build_stages(rate_limiter, llm_batch_size, session)
     
     pipeline = (
         FunctionalPipeline()
-        .run("read", FileReader()) 
-        .run("filter", GrinchFilter(), dependencies=[Dependency("read", target_key="data")])
-        .run("log", GrinchLogger(), dependencies=[Dependency("filter", target_key="data")])
-        .run("extract", LLMExtractor(model_name="gemini-1.5-flash"), dependencies=[Dependency("filter", target_key="data")])
-        .run("load", DatabaseLoader(session_factory=lambda: Session(engine)), dependencies=[Dependency("extract", target_key="data")])
+        .run("read", reader) 
+        .run("filter", grinch_filter, dependencies=[Dependency("read", target_key="data")])
+        .run("log", grinch_logger, dependencies=[Dependency("filter", target_key="data")])
+        .run("extract", extractor, dependencies=[Dependency("filter", target_key="data")])
+        .run("load", loader, dependencies=[Dependency("extract", target_key="data")])
     )
     
     return pipeline
+
+
+def build_fast_single_file_run(
+    rate_limiter: RateLimiter | None = None,
+    llm_batch_size: int = 1,
+    session: Session | None = None
+) -> Callable[[Path], dict]:
+    """
+    Same stages and options as `build_single_file_pipeline`, flattened into one
+    function that calls each stage directly: no dependency resolution or
+    per-node dispatch, and the spam branch skips the LLM/DB stages outright.
+    Returns `fast_run(file_path)`, whose result has the same node keys as
+    `pipeline.execute`. Use the FunctionalPipeline when debugging the flow.
+    """
+    reader, grinch_filter, grinch_logger, extractor, loader = _build_stages(rate_limiter, llm_batch_size, session)
+
+    def fast_run(file_path: Path) -> dict:
+        data = grinch_filter._run(reader._run(file_path))
+        if data["is_spam"]:
+            grinch_logger._run(data)
+            return {"read": data, "filter": data, "log": data, "extract": data, "load": None}
+        extracted = extractor._run(data=data)
+        return {"read": data, "filter": data, "log": data, "extract": extracted, "load": loader._run(extracted)}
+
+    return fast_run
@@ -3,10 +3,12 @@ Test script to verify extraction flow from file to SQLite database.
 Processes a few good letters and saves them to db_test.db.
 """
 import os
+import asyncio
 from pathlib import Path
 from sqlmodel import SQLModel, create_engine, Session, select
 from src.extractors import LetterExtractor
-from src.models import Child, Letter
+from src.core.models import Child, Letter
+from src.core.uring_reader import read_text_async
 
 # 1. Setup SQLite Test DB
 DB_FILE = "db_test.db"
@@ -20,6 +22,10 @@ def init_test_db():
     print(f"🔧 Initializing test database: {DB_FILE}")
     SQLModel.metadata.create_all(engine)
 
+async def prefetch_letters(paths):
+    """Read all letters concurrently; missing files come back as exceptions."""
+    return await asyncio.gather(*[read_text_async(p) for p in paths], return_exceptions=True)
+
 def run_test():
     init_test_db()
     
@@ -31,31 +37,43 @@ def run_test():
         Path("data/test_letters/child_usa_012.txt")
     ]
     
+    # Reads overlap instead of hitting the disk one letter at a time
+    contents = asyncio.run(prefetch_letters(test_files))
+    
     with Session(engine) as session:
-        for file_path in test_files:
-            if not file_path.exists():
+        # Simple deduplication for test: (name, country) -> child id, loaded with one SELECT
+        child_ids = {
+            (name, country): child_id
+            for name, country, child_id in session.exec(select(Child.name, Child.country, Child.id))
+        }
+        
+        for file_path, content in zip(test_files, contents):
+            if isinstance(content, OSError):
                 print(f"⚠ Skipping {file_path.name} (not found)")
                 continue
             
             print(f"\n📬 Processing {file_path.name}...")
             try:
                 # Extract objects
-                child_new, letter_new = extractor.extract_from_file(file_path)
+                child_new, letter_new, _ = extractor.extract_from_content(content, file_path)
                 
-                # Check if child already exists by name/country (simple deduplication for test)
-                statement = select(Child).where(Child.name == child_new.name, Child.country == child_new.country)
-                existing_child = session.exec(statement).first()
+                # Check if child already exists by name/country
+                key = (child_new.name, child_new.country)
+                child_id = child_ids.get(key)
                 
-                if existing_child:
-                    print(f"👤 Found existing child: {existing_child.name}")
-                    letter_new.child = existing_child
+                if child_id is not None:
+                    print(f"👤 Found existing child: {child_new.name}")
                 else:
                     print(f"👶 Created new child: {child_new.name}")
                     session.add(child_new)
-                    letter_new.child = child_new
+                    session.flush()
+                    child_id = child_new.id
+                letter_new.child_id = child_id
                 
                 session.add(letter_new)
                 session.commit()
+                # Remember the child only once it is actually committed
+                child_ids[key] = child_id
                 print(f"✅ Saved {child_new.name}'s letter to DB")
                 
             except Exception as e:
@@ -2,7 +2,8 @@
 Fake ETL - Direct Database Population Script
 Bypasses LLM extraction by loading pre-made JSON data.
 """
-import json
+import ijson
+import logging
 import sys
 import os
 from pathlib import Path
@@ -14,15 +15,29 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "Elf-ETL module" / "src"))
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent.parent / ".env")
 
+from sqlalchemy import insert
 from sqlmodel import SQLModel, create_engine, Session
 from core.models import Child, Letter, CountryEnum, GenderEnum
 
+# Records parsed and inserted per round trip
+CHUNK_SIZE = 1000
+
+# JSON string -> enum member, resolved with a dict lookup per row
+_COUNTRY_MAP = {member.value: member for member in CountryEnum}
+_GENDER_MAP = {member.value: member for member in GenderEnum}
+
+# Per-row details at DEBUG (off by default); progress is printed once per chunk
+logger = logging.getLogger(__name__)
+
 
 def get_engine():
     """Create database engine from environment."""
     db_url = os.getenv("SANTA_DB_URL")
     if not db_url:
         raise ValueError("SANTA_DB_URL not found in environment!")
+    if db_url.startswith(("postgresql", "postgres")):
+        # psycopg2 fast execution helpers for the bulk INSERTs below
+        return create_engine(db_url, echo=False, executemany_mode="values_plus_batch")
     return create_engine(db_url, echo=False)
 
 
@@ -34,56 +49,70 @@ def reset_and_init_db(engine):
     SQLModel.metadata.create_all(engine)
 
 
-def load_fake_data(json_path: Path, engine) -> tuple[int, int]:
-    """Load fake children data from JSON into database."""
-    with open(json_path, "r", encoding="utf-8") as f:
-        children_data = json.load(f)
+def _child_row(data: dict) -> dict:
+    """Map one JSON record to a Child row."""
+    return {
+        "name": data["name"],
+        "age": data["age"],
+        "city": data["city"],
+        # Unknown countries fall back to UNKNOWN; an unknown gender is a data error
+        "country": _COUNTRY_MAP.get(data["country"].lower(), CountryEnum.UNKNOWN),
+        "gender": _GENDER_MAP[data["gender"].lower()]
+    }
+
+
+def _insert_chunk(session: Session, chunk: list[dict], received_at: datetime) -> int:
+    """Bulk insert one chunk of JSON records (children, then their letters)."""
+    child_rows = [_child_row(data) for data in chunk]
+    # One INSERT ... RETURNING for all children, ids in input order
+    child_ids = session.scalars(
+        insert(Child).returning(Child.id, sort_by_parameter_order=True),
+        child_rows
+    ).all()
     
-    children_count = 0
-    letters_count = 0
+    letter_rows = [
+        {
+            "content": data["letter"],
+            "is_spam": False,
+            "received_at": received_at,
+            "goodness_score": data["goodness"],
+            "gift_request": data["gifts"],
+            "coal_qty_kg": 0,
+            "child_id": child_id
+        }
+        for data, child_id in zip(chunk, child_ids)
+    ]
+    session.execute(insert(Letter), letter_rows)
     
-    with Session(engine) as session:
-        for data in children_data:
-            # Map country string to enum
-            country_str = data["country"].lower()
-            try:
-                country = CountryEnum(country_str)
-            except ValueError:
-                country = CountryEnum.UNKNOWN
-            
-            # Map gender string to enum
-            gender_str = data["gender"].lower()
-            gender = GenderEnum(gender_str)
-            
-            # Create Child
-            child = Child(
-                name=data["name"],
-                age=data["age"],
-                city=data["city"],
-                country=country,
-                gender=gender
-            )
-            session.add(child)
-            session.commit()
-            session.refresh(child)
-            children_count += 1
-            
-            # Create Letter
-            letter = Letter(
-                content=data["letter"],
-                is_spam=False,
-                received_at=datetime.utcnow(),
-                goodness_score=data["goodness"],
-                gift_request=data["gifts"],
-                child_id=child.id
-            )
-            session.add(letter)
-            session.commit()
-            letters_count += 1
-            
-            print(f"   ✅ Loaded: {child.name} ({child.country.value}) - {len(data['gifts'])} gifts")
+    if logger.isEnabledFor(logging.DEBUG):
+        for row, data in zip(child_rows, chunk):
+            logger.debug("Loaded: %s (%s) - %d gifts", row["name"], row["country"].value, len(data["gifts"]))
+    return len(chunk)
+
+
+def load_fake_data(json_path: Path, engine, chunk_size: int = CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Stream fake children data from JSON into database.
+    Records are parsed incrementally and bulk inserted `chunk_size` at a time,
+    all in one transaction.
+    """
+    loaded = 0
+    # One load, one timestamp
+    now = datetime.utcnow()
+    with open(json_path, "rb") as f, Session(engine) as session:
+        chunk = []
+        for data in ijson.items(f, "item", use_float=True):
+            chunk.append(data)
+            if len(chunk) >= chunk_size:
+                loaded += _insert_chunk(session, chunk, now)
+                chunk = []
+                print(f"   ✅ Loaded {loaded} children...")
+        if chunk:
+            loaded += _insert_chunk(session, chunk, now)
+            print(f"   ✅ Loaded {loaded} children...")
+        session.commit()
     
-    return children_count, letters_count
+    return loaded, loaded
 
 
 def main():
@@ -12,6 +12,7 @@ Configura anche la connessione al database e la gestione del client MCP per Meta
 import os
 import json
 import time
+import threading
 import requests
 from dotenv import load_dotenv
 from pathlib import Path
@@ -172,79 +173,125 @@ FLUSSO DI LAVORO:
 Rispondi sempre con il tono gioioso di Babbo Natale 🎅.
 """
 
+# URL API locale (accessibile dall'host dove gira questo script)
+METABASE_API_URL = "http://localhost:3000/api"
+# Durata di riuso del token di sessione (le sessioni Metabase durano molto di più)
+METABASE_TOKEN_TTL = 1200
+
+# Stato a livello di modulo: una sola connessione HTTP (keep-alive) e un solo login per processo
+_mb_session = requests.Session()
+_mb_token = None
+_mb_token_ts = 0.0
+_db_configured = False
+_mb_lock = threading.Lock()
+
+
+def _metabase_token(force_login: bool = False):
+    """
+    Restituisce il token di sessione Metabase, rifacendo il login solo se
+    scaduto (oltre METABASE_TOKEN_TTL secondi) o se richiesto esplicitamente.
+    Restituisce None se il login fallisce.
+    """
+    global _mb_token, _mb_token_ts
+    if not force_login and _mb_token and time.time() - _mb_token_ts < METABASE_TOKEN_TTL:
+        return _mb_token
+
+    login_payload = {
+        "username": METABASE_USERNAME,
+        "password": METABASE_PASSWORD
+    }
+    res = _mb_session.post(f"{METABASE_API_URL}/session", json=login_payload)
+    if not res.ok:
+        print(f"⚠️ [METABASE] Login fallito: {res.text}")
+        _mb_token = None
+        return None
+
+    _mb_token = res.json().get("id")
+    _mb_token_ts = time.time()
+    return _mb_token
+
+
 def ensure_metabase_connection():
     """
     Verifica e configura la connessione tra Metabase e il database PostgreSQL ('elf_db').
     
     Questa funzione chiama le API di Metabase per:
-    1. Effettuare il login e ottenere un token di sessione.
+    1. Effettuare il login e ottenere un token di sessione (riusato per METABASE_TOKEN_TTL secondi).
     2. Controllare se il database 'elf_db' è già configurato.
     3. Se manca, aggiungerlo con le credenziali corrette (collegandosi via rete Docker interna).
+    
+    Una volta verificato 'elf_db', le chiamate successive nello stesso processo non fanno richieste HTTP.
     """
-    try:
-        # URL API locale (accessibile dall'host dove gira questo script)
-        api_url = "http://localhost:3000/api"
-        
-        # 1. Login
-        session = requests.Session()
-        login_payload = {
-            "username": METABASE_USERNAME,
-            "password": METABASE_PASSWORD
-        }
-        res = session.post(f"{api_url}/session", json=login_payload)
-        if not res.ok:
-            print(f"⚠️ [METABASE] Login fallito: {res.text}")
+    global _db_configured
+    if _db_configured:
+        return
+
+    # Chiamate concorrenti attendono la prima verifica invece di aggiungere 'elf_db' due volte
+    with _mb_lock:
+        if _db_configured:
             return
+
+        try:
+            # 1. Login (token in cache se ancora valido)
+            token = _metabase_token()
+            if not token:
+                return
         
-        token = res.json().get("id")
-        headers = {"X-Metabase-Session": token}
-        
-        # 2. Lista Database
-        res = session.get(f"{api_url}/database", headers=headers)
-        if not res.ok:
-            print(f"⚠️ [METABASE] Impossibile listare DB: {res.text}")
-            return
+            # 2. Lista Database
+            res = _mb_session.get(f"{METABASE_API_URL}/database", headers={"X-Metabase-Session": token})
+            if res.status_code == 401:
+                # Token invalidato lato server: nuovo login e un solo nuovo tentativo
+                token = _metabase_token(force_login=True)
+                if not token:
+                    return
+                res = _mb_session.get(f"{METABASE_API_URL}/database", headers={"X-Metabase-Session": token})
+            if not res.ok:
+                print(f"⚠️ [METABASE] Impossibile listare DB: {res.text}")
+                return
+            headers = {"X-Metabase-Session": token}
             
-        data = res.json()
+            data = res.json()
         
-        # Gestione flessibile della risposta (list o dict)
-        if isinstance(data, list):
-            databases = data
-        elif isinstance(data, dict):
-            databases = data.get("data", data.get("databases", []))
-        else:
-            databases = []
-
-        db_names = [db.get("name") for db in databases if isinstance(db, dict)]
+            # Gestione flessibile della risposta (list o dict)
+            if isinstance(data, list):
+                databases = data
+            elif isinstance(data, dict):
+                databases = data.get("data", data.get("databases", []))
+            else:
+                databases = []
+
+            db_names = [db.get("name") for db in databases if isinstance(db, dict)]
         
-        if "elf_db" in db_names:
-            print("✅ [METABASE] Database 'elf_db' già configurato.")
-            return
+            if "elf_db" in db_names:
+                print("✅ [METABASE] Database 'elf_db' già configurato.")
+                _db_configured = True
+                return
 
-        print("🔄 [METABASE] Configurazione 'elf_db' in corso...")
+            print("🔄 [METABASE] Configurazione 'elf_db' in corso...")
         
-        # 3. Aggiunta Database (Parametri Docker interni)
-        db_details = {
-            "name": "elf_db",
-            "engine": "postgres",
-            "details": {
-                "host": "postgres", # Nome del servizio docker-compose
-                "port": 5432,
-                "dbname": "elf_db",
-                "user": "santa",
-                "password": "santa_password",
-                "ssl": False
+            # 3. Aggiunta Database (Parametri Docker interni)
+            db_details = {
+                "name": "elf_db",
+                "engine": "postgres",
+                "details": {
+                    "host": "postgres", # Nome del servizio docker-compose
+                    "port": 5432,
+                    "dbname": "elf_db",
+                    "user": "santa",
+                    "password": "santa_password",
+                    "ssl": False
+                }
             }
-        }
         
-        res = session.post(f"{api_url}/database", json=db_details, headers=headers)
-        if res.ok:
-            print("✅ [METABASE] Database 'elf_db' configurato con successo!")
-        else:
-            print(f"❌ [METABASE] Errore configurazione DB: {res.text}")
+            res = _mb_session.post(f"{METABASE_API_URL}/database", json=db_details, headers=headers)
+            if res.ok:
+                print("✅ [METABASE] Database 'elf_db' configurato con successo!")
+                _db_configured = True
+            else:
+                print(f"❌ [METABASE] Errore configurazione DB: {res.text}")
             
-    except Exception as e:
-        print(f"⚠️ [METABASE] Errore durante l'auto-configurazione: {e}")
+        except Exception as e:
+            print(f"⚠️ [METABASE] Errore durante l'auto-configurazione: {e}")
 
 
 def get_metabase_agent():
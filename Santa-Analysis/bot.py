@@ -15,6 +15,7 @@ Caratteristiche principali:
 import chainlit as cl
 import sys
 import re
+from collections import deque
 from pathlib import Path
 
 # ===============================
@@ -50,6 +51,9 @@ DASHBOARD_KEYWORDS = [
     r"make.*dashboard",
 ]
 
+# Tutti i pattern compilati una sola volta in un'unica alternanza (una sola scansione per messaggio)
+_DASHBOARD_RE = re.compile("|".join(f"(?:{p})" for p in DASHBOARD_KEYWORDS), re.IGNORECASE)
+
 def is_dashboard_request(text: str) -> bool:
     """
     Analizza il testo dell'utente per determinare se sta chiedendo una dashboard.
@@ -60,17 +64,17 @@ def is_dashboard_request(text: str) -> bool:
     Returns:
         bool: True se è una richiesta di dashboard, False altrimenti.
     """
-    text_lower = text.lower()
-    for pattern in DASHBOARD_KEYWORDS:
-        if re.search(pattern, text_lower):
-            return True
-    return False
+    return _DASHBOARD_RE.search(text) is not None
 
 
 # ===============================
 # GESTORI EVENTI CHAINLIT
 # ===============================
 
+# Contesto per l'agente Metabase: solo le ultime analisi, con risultati già troncati
+ANALYSIS_HISTORY_SIZE = 5
+ANALYSIS_RESULT_CHARS = 200
+
 @cl.on_chat_start
 async def start():
     """
@@ -80,7 +84,8 @@ async def start():
     # Inizializzazione variabili di sessione
     cl.user_session.set("messages", [])
     # 'analysis_history' serve a dare contesto all'agente Metabase sulle query precedenti
-    cl.user_session.set("analysis_history", [])
+    # (buffer circolare: la sessione non cresce con il numero di messaggi)
+    cl.user_session.set("analysis_history", deque(maxlen=ANALYSIS_HISTORY_SIZE))
     
     # Messaggio di benvenuto
     await cl.Message(
@@ -104,7 +109,9 @@ async def main(message: cl.Message):
     """
     # Recupero dati sessione
     messages = cl.user_session.get("messages") or []
-    analysis_history = cl.user_session.get("analysis_history") or []
+    analysis_history = cl.user_session.get("analysis_history")
+    if analysis_history is None:
+        analysis_history = deque(maxlen=ANALYSIS_HISTORY_SIZE)
     
     user_text = message.content
     messages.append({"role": "user", "content": user_text})
@@ -120,18 +127,22 @@ async def main(message: cl.Message):
             msg.content = "📊 *Sto creando la dashboard in Metabase...*"
             await msg.update()
             
-            # Recupero l'agente on-demand (gestisce errori di connessione)
-            metabase_agent = get_metabase_agent()
+            # Recupero l'agente dalla sessione: container MCP e lista tool si pagano
+            # solo alla prima richiesta di dashboard (gestisce errori di connessione)
+            metabase_agent = cl.user_session.get("metabase_agent")
             if metabase_agent is None:
-                msg.content = "⚠️ **Metabase non è raggiungibile.** Assicurati che Docker sia attivo e Metabase sia avviato."
-                await msg.update()
-                return
+                metabase_agent = get_metabase_agent()
+                if metabase_agent is None:
+                    msg.content = "⚠️ **Metabase non è raggiungibile.** Assicurati che Docker sia attivo e Metabase sia avviato."
+                    await msg.update()
+                    return
+                cl.user_session.set("metabase_agent", metabase_agent)
             
             # Costruisco il prompt con il contesto delle ultime analisi
-            context = "Contesto delle analisi precedenti:\n"
-            for item in analysis_history[-5:]:  # Limita agli ultimi 5 elementi
-                context += f"- Query: {item.get('query', 'N/A')}\n"
-                context += f"  Risultato: {item.get('result', 'N/A')[:200]}...\n"
+            context = "Contesto delle analisi precedenti:\n" + "".join(
+                f"- Query: {item['query']}\n  Risultato: {item['result']}...\n"
+                for item in analysis_history
+            )
             
             full_prompt = f"{context}\n\nRichiesta utente: {user_text}"
             
@@ -164,7 +175,7 @@ async def main(message: cl.Message):
             # Salvataggio risultato in cronologia per contesto futuro
             analysis_history.append({
                 "query": user_text,
-                "result": final_text_answer
+                "result": final_text_answer[:ANALYSIS_RESULT_CHARS]
             })
             cl.user_session.set("analysis_history", analysis_history)
             
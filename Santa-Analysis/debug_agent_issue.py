@@ -1,44 +1,156 @@
 import sys
 import os
+import json
+import time
+import importlib
+import logging
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# Setup paths
+# Setup paths (once, ahead of site-packages: local modules win on the first probe)
 current_dir = Path(__file__).resolve().parent
-sys.path.append(str(current_dir))
-sys.path.append(str(current_dir.parent))
+for _path in (str(current_dir.parent), str(current_dir)):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+@lru_cache(maxsize=1)
+def _parse_env(path: str, mtime_ns: int) -> dict:
+    # mtime is part of the cache key only: an edited .env is parsed again
+    return dotenv_values(path)
+
+def _load_env_once(path: Path) -> dict:
+    """Parse `path` once per process and copy it into os.environ (existing vars win)."""
+    try:
+        values = _parse_env(str(path), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return {}
+    for key, value in values.items():
+        if value is not None:
+            os.environ.setdefault(key, value)
+    return values
 
 # Load Env
-load_dotenv(current_dir.parent / ".env")
+_ENV_CACHE = _load_env_once(current_dir.parent / ".env")
+
+# Settings read once, after .env is loaded
+_CFG = {key: os.environ.get(key, "") for key in ("METABASE_USERNAME", "METABASE_PASSWORD", "METABASE_API_URL")}
+_CFG["METABASE_API_URL"] = _CFG["METABASE_API_URL"] or "http://localhost:3000/api"
+# Masked password for the auth printout
+_MASK = "*" * len(_CFG["METABASE_PASSWORD"]) if _CFG["METABASE_PASSWORD"] else "EMPTY"
+# Login request body, serialised once
+_LOGIN_BODY = json.dumps({"username": _CFG["METABASE_USERNAME"], "password": _CFG["METABASE_PASSWORD"]}).encode("utf-8")
+# Session token kept between runs (Metabase sessions last days): warm runs skip the login
+TOKEN_FILE = current_dir / ".metabase_token.json"
+
+def _load_token():
+    try:
+        return json.loads(TOKEN_FILE.read_text(encoding="utf-8")).get("token")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _save_token(token: str):
+    # Owner-only file, replaced atomically: it grants API access like a password
+    tmp_path = TOKEN_FILE.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"token": token, "ts": time.time()}, f)
+    os.chmod(tmp_path, 0o600)
+    os.replace(tmp_path, TOKEN_FILE)
+
+# Diagnostics go through logging: with SANTA_LOG=WARNING the INFO lines are never formatted
+_LOG_LEVEL = os.getenv("SANTA_LOG", "INFO").upper()
+_console = logging.StreamHandler(sys.stdout)
+_console.setFormatter(logging.Formatter("%(message)s"))
+log = logging.getLogger("santa.debug")
+log.setLevel(_LOG_LEVEL)
+log.addHandler(_console)
+log.propagate = False
+
+def _cached_import(module_name: str, name: str):
+    """Return `module_name.name`, importing the module only if it isn't loaded yet."""
+    module = sys.modules.get(module_name) or importlib.import_module(module_name)
+    return getattr(module, name)
 
 try:
-    from bot import is_dashboard_request
-    print("✅ Successfully imported is_dashboard_request")
+    is_dashboard_request = _cached_import("bot", "is_dashboard_request")
+    # Pure predicate of the text: repeated queries are answered from memory
+    _is_dash = lru_cache(maxsize=128)(is_dashboard_request)
+    log.info("✅ Successfully imported is_dashboard_request")
 except ImportError as e:
-    print(f"❌ Failed to import bot: {e}")
+    log.error("❌ Failed to import bot: %s", e)
     sys.exit(1)
 
 try:
-    from agent import get_metabase_agent, ensure_metabase_connection
-    print("✅ Successfully imported agent functions")
+    get_metabase_agent = _cached_import("agent", "get_metabase_agent")
+    ensure_metabase_connection = _cached_import("agent", "ensure_metabase_connection")
+    log.info("✅ Successfully imported agent functions")
 except ImportError as e:
-    print(f"❌ Failed to import agent: {e}")
+    log.error("❌ Failed to import agent: %s", e)
     sys.exit(1)
 
+# requests is only imported by the tests that talk HTTP (test_trigger never does)
+_requests = None
+# One HTTP session for the whole run: connections to Metabase are kept alive and reused
+_SESSION = None
+
+def _req():
+    global _requests
+    if _requests is None:
+        import requests
+        _requests = requests
+    return _requests
+
+def _get_session():
+    global _SESSION
+    if _SESSION is None:
+        from requests.adapters import HTTPAdapter
+        _SESSION = _req().Session()
+        _SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0))
+        _SESSION.headers.update({"Connection": "keep-alive", "Accept": "application/json"})
+    return _SESSION
+
+# (full query, 30-char preview for the printout)
+_TEST_QUERIES = tuple((q, q[:30]) for q in (
+    "Creami report per vedere come cambia la quantità",
+    "create dashboard",
+    "Ciao come stai",
+    "Dammi i bambini buoni",
+))
+
+# The test phases run in parallel threads: one block of output at a time
+_print_lock = threading.Lock()
+
+def _phase_logger(name: str) -> logging.Logger:
+    """Logger for one test phase; its records are held in memory until `_flush`."""
+    phase_log = log.getChild(name)
+    if not phase_log.handlers:
+        phase_log.addHandler(logging.handlers.MemoryHandler(
+            capacity=1000, flushLevel=logging.CRITICAL, target=_console
+        ))
+        phase_log.propagate = False
+    return phase_log
+
+def _flush(phase_log: logging.Logger):
+    """Write the phase's buffered records to stdout together."""
+    with _print_lock:
+        for handler in phase_log.handlers:
+            handler.flush()
+
 def test_trigger():
-    print("\n🔍 Testing Trigger Logic...")
-    test_queries = [
-        "Creami report per vedere come cambia la quantità",
-        "create dashboard",
-        "Ciao come stai",
-        "Dammi i bambini buoni"
-    ]
-    for q in test_queries:
-        triggered = is_dashboard_request(q)
-        print(f"  Query: '{q[:30]}...' -> Dashboard Request? {triggered}")
+    out = _phase_logger("trigger")
+    out.info("\n🔍 Testing Trigger Logic...")
+    for full, short in _TEST_QUERIES:
+        out.info("  Query: '%s...' -> Dashboard Request? %s", short, _is_dash(full))
+    _flush(out)
 
 def test_connection_func():
-    print("\n🔄 Testing ensure_metabase_connection()...")
+    # Output is buffered and flushed around the blocking network calls
+    out = _phase_logger("connection")
+    out.info("\n🔄 Testing ensure_metabase_connection()...")
     # We need to mock requests or just call it and see what happens
     # Since we are importing it from agent, we can't easily inject mocks without mocking sys.modules or using unittest.mock
     # But we can monkeypatch `requests.Session` if we firmly want to, or just call the function and debug the print output if we modify agent.py
@@ -47,54 +159,79 @@ def test_connection_func():
     # OR we can replicate the logic here to see what the API returns.
     
     # Replicating logic mainly to debug API response
-    import requests
-    import os
     
-    username = os.getenv("METABASE_USERNAME", "")
-    password = os.getenv("METABASE_PASSWORD", "")
-    api_url = "http://localhost:3000/api"
+    username = _CFG["METABASE_USERNAME"]
+    api_url = _CFG["METABASE_API_URL"]
     
-    print(f"  Auth: {username} / {'*' * len(password) if password else 'EMPTY'}")
+    out.info("  Auth: %s / %s", username, _MASK)
+    _flush(out)
     
     try:
-        session = requests.Session()
-        res = session.post(f"{api_url}/session", json={"username": username, "password": password})
-        print(f"  Login Status: {res.status_code}")
-        if not res.ok:
-            print(f"  Login Response: {res.text}")
-            return
-            
-        token = res.json().get("id")
-        headers = {"X-Metabase-Session": token}
+        session = _get_session()
+        token = _load_token()
+        if token:
+            res = session.get(f"{api_url}/user/current", headers={"X-Metabase-Session": token})
+            if res.ok:
+                out.info("  Reusing cached session token from %s (login skipped)", TOKEN_FILE.name)
+            else:
+                out.info("  Cached session token rejected (%s), logging in again", res.status_code)
+                token = None
+        
+        if not token:
+            res = session.post(f"{api_url}/session", data=_LOGIN_BODY, headers={"Content-Type": "application/json"})
+            out.info("  Login Status: %s", res.status_code)
+            # Login and listing should share one TCP connection: make a closing server visible
+            if res.headers.get("Connection", "keep-alive").lower() != "keep-alive":
+                out.warning("  ⚠️ Server did not keep the connection alive (Connection: %s)", res.headers["Connection"])
+            if not res.ok:
+                out.info("  Login Response: %s", res.text)
+                _flush(out)
+                return
+                
+            token = res.json().get("id")
+            if not token:
+                # Don't cache a null token or fall through to unauthenticated requests
+                out.warning("  ⚠️ Login response has no session id: %s", res.text)
+                _flush(out)
+                return
+            _save_token(token)
+        # Authenticates every later request on the shared session
+        session.headers["X-Metabase-Session"] = token
+        _flush(out)
         
-        res = session.get(f"{api_url}/database", headers=headers)
-        print(f"  List DB Status: {res.status_code}")
+        res = session.get(f"{api_url}/database")
+        out.info("  List DB Status: %s", res.status_code)
+        # Raw body slice: no re-serialising the parsed list just to preview it
+        out.info("  List DB Content (first 200 bytes): %r", res.content[:200])
         try:
             data = res.json()
-            print(f"  List DB Type: {type(data)}")
-            print(f"  List DB Content (first 100 chars): {str(data)[:100]}")
+            out.info("  List DB Type: %s", type(data))
         except Exception as e:
-            print(f"  Failed to parse JSON: {e}")
+            out.info("  Failed to parse JSON: %s", e)
             
     except Exception as e:
-        print(f"  Error in manual test: {e}")
+        out.error("  Error in manual test: %s", e)
     
-    # Also call the actual function
-    print("  calling agent.ensure_metabase_connection()...")
+    # Also call the actual function (it prints on its own)
+    out.info("  calling agent.ensure_metabase_connection()...")
+    _flush(out)
     ensure_metabase_connection()
 
 def test_get_agent():
-    print("\n🤖 Testing get_metabase_agent()...")
+    out = _phase_logger("agent")
+    out.info("\n🤖 Testing get_metabase_agent()...")
     try:
         agent = get_metabase_agent()
         if agent:
-            print(f"  ✅ Agent created successfully: {agent.name}")
+            out.info("  ✅ Agent created successfully: %s", agent.name)
         else:
-            print("  ⚠️ Agent creation returned None")
+            out.warning("  ⚠️ Agent creation returned None")
     except Exception as e:
-        print(f"  ❌ Error in get_metabase_agent: {e}")
+        out.error("  ❌ Error in get_metabase_agent: %s", e)
+    _flush(out)
 
 if __name__ == "__main__":
-    test_trigger()
-    test_connection_func()
-    test_get_agent()
+    # Independent phases; the two network-bound ones overlap their waits
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for future in [executor.submit(test) for test in (test_trigger, test_connection_func, test_get_agent)]:
+            future.result()
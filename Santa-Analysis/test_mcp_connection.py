@@ -1,41 +1,101 @@
 import sys
+import json
+import time
+import logging
+import logging.handlers
+from operator import attrgetter
 from pathlib import Path
 import os
 
-# Add current dir to sys.path
+# Add current dir to sys.path (once, ahead of site-packages: local modules win on the first probe)
 current_dir = Path(__file__).resolve().parent
-sys.path.append(str(current_dir))
-sys.path.append(str(current_dir.parent))
+for _path in (str(current_dir.parent), str(current_dir)):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
 
-print(f"📂 Added paths: {current_dir}, {current_dir.parent}")
+# Diagnostics go through logging: with SANTA_LOG=WARNING the INFO lines are never formatted
+_console = logging.StreamHandler(sys.stdout)
+_console.setFormatter(logging.Formatter("%(message)s"))
+log = logging.getLogger("santa.mcp_test")
+log.setLevel(os.getenv("SANTA_LOG", "INFO").upper())
+# Records are held and written together (see _flush), error records right away
+_buffer = logging.handlers.MemoryHandler(capacity=1000, flushLevel=logging.ERROR, target=_console)
+log.addHandler(_buffer)
+log.propagate = False
+
+def _flush():
+    _buffer.flush()
+
+log.info("📂 Added paths: %s, %s", current_dir, current_dir.parent)
+_flush()
 
 try:
     from agent import metabase_mcp
-    print("✅ Successfully imported metabase_mcp from agent.py")
+    log.info("✅ Successfully imported metabase_mcp from agent.py")
+    _flush()
 except ImportError as e:
-    print(f"❌ Failed to import agent: {e}")
+    log.error("❌ Failed to import agent: %s", e)
     sys.exit(1)
 
-def test_connection():
-    print("🔌 Testing MCP Connection (may take a moment to spin up container)...")
+# Tool names from the last successful run (skips the container spin-up while fresh)
+TOOLS_CACHE = current_dir / ".mcp_tools_cache.json"
+TOOLS_CACHE_TTL = 3600  # seconds
+
+_tool_name = attrgetter("name")
+
+def _load_cached_tools():
+    """Tool names cached less than TOOLS_CACHE_TTL seconds ago, or None."""
+    try:
+        if time.time() - TOOLS_CACHE.stat().st_mtime < TOOLS_CACHE_TTL:
+            return json.loads(TOOLS_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _save_cached_tools(names):
+    # Write then rename: a crash never leaves a half-written cache behind
+    tmp_path = TOOLS_CACHE.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(names), encoding="utf-8")
+    os.replace(tmp_path, TOOLS_CACHE)
+
+def test_connection(refresh: bool = False):
+    names = None if refresh else _load_cached_tools()
+    if names is not None:
+        log.info("🗂️ Using cached MCP tool list (%s, run with --refresh to reconnect)", TOOLS_CACHE.name)
+        log.info("\n✅ Found %d tools:", len(names))
+        for name in names:
+            log.info(" - %s", name)
+        _flush()
+        return
+
+    log.info("🔌 Testing MCP Connection (may take a moment to spin up container)...")
+    _flush()
     try:
         # The list_tools method is synchronous based on usage in agent.py
         tools = metabase_mcp.list_tools()
         
-        print(f"\n✅ Connection Successful! Found {len(tools)} tools:")
+        log.info("\n✅ Connection Successful! Found %d tools:", len(tools))
+        names = []
         for tool in tools:
             # Assuming tool object structure, adjusting if print looks weird
-            name = getattr(tool, 'name', None)
+            try:
+                name = _tool_name(tool)
+            except AttributeError:
+                name = None
             if name is None:
                  # fallback if it's a pydantic model or dict
                  name = tool.get('name') if isinstance(tool, dict) else str(tool)
             
-            print(f" - {name}")
+            log.info(" - %s", name)
+            names.append(name)
+        # The whole listing is written together
+        _flush()
+        _save_cached_tools(names)
             
     except Exception as e:
-        print(f"\n❌ Connection Failed: {e}")
+        log.error("\n❌ Connection Failed: %s", e)
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_connection()
+    test_connection(refresh="--refresh" in sys.argv[1:])